@@ -0,0 +1,174 @@
+"""
+Synthetic data for benchmarks and load tests.
+
+Creates users (all named <prefix>_<n>), completed questionnaires drawn from
+the vector_logic maps, listings and chat messages between users, loaded with
+COPY so 100k users take seconds. Then rebuilds user_top_matches so
+/matches/my-matches serves from the stored lists as in production.
+
+Every synthetic user has the password "benchmark-password". Re-running with
+--reset first deletes the previous data of the same prefix.
+
+Usage (from backend/, database migrated):
+    python benchmarks/generate_data.py [--users 10000] [--completed 0.9] [--listings 5000]
+                                       [--messages 100000] [--partners 5] [--prefix bench] [--reset]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+from core.database import AsyncLocalSession
+from core.security import bycrypt_context
+from models.listing import Listing  # noqa: F401 (User.listings relationship)
+from models.types import pack_vector
+from services.listing_service import bulk_upsert_listings
+from services.vector_logic import (
+    SLEEP_MAP, CLEANLINESS_MAP, NOISE_MAP, GUEST_MAP, BUDGET_MAP, PRIORITY_MAP, DISTRICT_MAP,
+    processing_submissions,
+)
+
+PASSWORD = "benchmark-password"
+ANSWERS = {
+    "sleep_schedule": list(SLEEP_MAP),
+    "cleanliness": list(CLEANLINESS_MAP),
+    "noise_tolerance": list(NOISE_MAP),
+    "guest_frequency": list(GUEST_MAP),
+    "budget": list(BUDGET_MAP),
+    "priority": list(PRIORITY_MAP),
+    "district": list(DISTRICT_MAP),
+}
+GENDERS = ["Male", "Female", "Other"]
+UNIVERSITIES = ["RMIT", "HCMUT", "UEH", "HCMUS", "FTU"]
+MAJORS = ["Computer Science", "Business", "Design", "Economics", "Engineering"]
+LISTING_DISTRICTS = list(DISTRICT_MAP) + ["District 2", "Go Vap"]
+FEATURES = ["Air Conditioning", "WiFi", "Balcony", "Gym", "Pool", "Parking", "Elevator", "Pet Friendly"]
+LISTING_CHUNK = 5000
+
+
+async def copy_records(db, table: str, columns: list[str], records: list[tuple]):
+    """Loads rows with asyncpg's binary COPY."""
+    conn = await db.connection()
+    raw = await conn.get_raw_connection()
+    await raw.driver_connection.copy_records_to_table(table, records=records, columns=columns)
+
+
+async def reset(db, prefix: str):
+    """Deletes every row belonging to users of this prefix."""
+    users = "(SELECT id FROM users WHERE username LIKE :pattern)"
+    params = {"pattern": f"{prefix}\\_%"}
+    for statement in [
+        f"DELETE FROM messages WHERE sender_id IN {users} OR receiver_id IN {users}",
+        f"DELETE FROM conversation_reads WHERE user_id IN {users} OR partner_id IN {users}",
+        f"DELETE FROM user_top_matches WHERE user_id IN {users} OR match_user_id IN {users}",
+        f"DELETE FROM user_vectors WHERE user_id IN {users}",
+        f"DELETE FROM listings WHERE owner_id IN {users}",
+        "DELETE FROM users WHERE username LIKE :pattern",
+    ]:
+        await db.execute(text(statement), params)
+    await db.commit()
+
+
+async def generate(args):
+    rng = random.Random(args.seed)
+    started = time.perf_counter()
+
+    async with AsyncLocalSession() as db:
+        if args.reset:
+            print(f"🧹 Deleting previous '{args.prefix}' data...")
+            await reset(db, args.prefix)
+
+        # 1. Users (one bcrypt hash shared by all: hashing 100k passwords would take hours)
+        print(f"👤 Creating {args.users} users...")
+        hashed = bycrypt_context.hash(PASSWORD)
+        await copy_records(db, "users", [
+            "username", "email", "hashed_password", "full_name", "age", "gender", "university", "major",
+            "profile_completed", "token_version",
+        ], [
+            (f"{args.prefix}_{n}", f"{args.prefix}_{n}@example.com", hashed, f"Bench User {n}",
+             rng.randint(18, 30), rng.choice(GENDERS), rng.choice(UNIVERSITIES), rng.choice(MAJORS), True, 0)
+            for n in range(args.users)
+        ])
+        user_ids = (await db.execute(
+            text("SELECT id FROM users WHERE username LIKE :pattern ORDER BY id"),
+            {"pattern": f"{args.prefix}\\_%"})).scalars().all()
+
+        # 2. Completed questionnaires, vectorized exactly like /test/submit
+        completed = [user_id for user_id in user_ids if rng.random() < args.completed]
+        print(f"🧠 Creating {len(completed)} questionnaires...")
+        records = []
+        for user_id in completed:
+            responses = {question: rng.choice(choices) for question, choices in ANSWERS.items()}
+            vector = processing_submissions(responses)
+            records.append((user_id, json.dumps(responses), responses["district"], responses["budget"],
+                            pack_vector(vector), float(np.linalg.norm(vector)), True))
+        await copy_records(db, "user_vectors", [
+            "user_id", "responses", "district", "budget", "vector_data_embeddings", "embedding_norm", "is_completed",
+        ], records)
+        await db.commit()
+
+        # 3. Listings, through the same upsert as import_listings.py
+        print(f"🏠 Creating {args.listings} listings...")
+        hosts = rng.sample(user_ids, min(len(user_ids), max(1, args.listings // 20)))
+        rows = [{
+            "source": args.prefix,
+            "external_id": str(n),
+            "owner_id": rng.choice(hosts),
+            "title": f"Bench listing {n}",
+            "price": rng.randrange(1_000_000, 20_000_000, 100_000),
+            "size": rng.randint(15, 120),
+            "district": rng.choice(LISTING_DISTRICTS),
+            "images": [],
+            "features": rng.sample(FEATURES, 3),
+            "description": "Synthetic listing for benchmarks.",
+        } for n in range(args.listings)]
+        for start in range(0, len(rows), LISTING_CHUNK):
+            await bulk_upsert_listings(db, rows[start:start + LISTING_CHUNK])
+        await db.commit()
+
+        # 4. Messages: each user talks to a few partners, timestamps spread over 30 days
+        print(f"💬 Creating {args.messages} messages...")
+        partners = {user_id: rng.sample(user_ids, min(args.partners, len(user_ids) - 1)) for user_id in user_ids}
+        now = datetime.now(timezone.utc)
+        records = []
+        for _ in range(args.messages):
+            sender = rng.choice(user_ids)
+            receiver = rng.choice(partners[sender])
+            if receiver == sender:
+                continue
+            sent_at = now - timedelta(seconds=rng.randint(0, 30 * 24 * 3600))
+            records.append((sender, receiver, f"Hello from {sender}", sent_at))
+        records.sort(key=lambda record: record[3])  # ids follow time, like real traffic
+        await copy_records(db, "messages", ["sender_id", "receiver_id", "content", "timestamp"], records)
+        await db.commit()
+
+    print(f"✅ Data created in {time.perf_counter() - started:.1f}s")
+
+    # 5. Stored match lists for everyone (see rebuild_top_matches.py)
+    if not args.skip_top_matches:
+        from rebuild_top_matches import rebuild
+        await rebuild()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--completed", type=float, default=0.9, help="share of users with a completed questionnaire")
+    parser.add_argument("--listings", type=int, default=5000)
+    parser.add_argument("--messages", type=int, default=100000)
+    parser.add_argument("--partners", type=int, default=5, help="conversation partners per user")
+    parser.add_argument("--prefix", default="bench", help="username prefix (and listing source) of the data")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reset", action="store_true", help="delete the prefix's previous data first")
+    parser.add_argument("--skip-top-matches", action="store_true", help="do not rebuild user_top_matches")
+    asyncio.run(generate(parser.parse_args()))
@@ -0,0 +1,77 @@
+"""
+Scalar vs batch listing scoring.
+
+Compares the per-listing calculate_listing_score loop with the vectorized
+calculate_listing_scores at several listing counts, and checks that both
+produce identical scores.
+
+Usage (from backend/):
+    python benchmarks/listing_scoring.py [--sizes 1000 10000 100000] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.listing_matching import (
+    DISTRICT_MAP,
+    calculate_listing_score,
+    calculate_listing_scores,
+    encode_districts,
+)
+
+USER_PREFS = {"district": "Binh Thanh", "budget": "2-3mil VND"}
+DISTRICTS = list(DISTRICT_MAP) + ["District 2"]  # include one district the map does not know
+
+
+def make_listings(count: int, seed: int = 42) -> list[SimpleNamespace]:
+    rng = random.Random(seed)
+    return [
+        SimpleNamespace(district=rng.choice(DISTRICTS), price=rng.randrange(800_000, 12_000_000, 50_000))
+        for _ in range(count)
+    ]
+
+
+def best_of(repeat: int, fn) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'listings':>10} {'scalar ms':>12} {'batch ms':>12} {'encode ms':>12} {'speedup':>9}")
+    for size in args.sizes:
+        listings = make_listings(size)
+        prices = np.fromiter((item.price for item in listings), dtype=np.int64, count=size)
+
+        # Columnar data is normally built once per load; its cost is reported separately
+        encode_s = best_of(args.repeat, lambda: encode_districts(item.district for item in listings))
+        codes = encode_districts(item.district for item in listings)
+
+        scalar_s = best_of(args.repeat, lambda: [calculate_listing_score(USER_PREFS, item) for item in listings])
+        batch_s = best_of(args.repeat, lambda: calculate_listing_scores(USER_PREFS, codes, prices))
+
+        expected = np.array([calculate_listing_score(USER_PREFS, item) for item in listings])
+        if not np.array_equal(expected, calculate_listing_scores(USER_PREFS, codes, prices)):
+            raise SystemExit(f"❌ Batch scores differ from calculate_listing_score at {size} listings")
+
+        print(f"{size:>10} {scalar_s * 1000:>12.2f} {batch_s * 1000:>12.2f} {encode_s * 1000:>12.2f} "
+              f"{scalar_s / batch_s:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
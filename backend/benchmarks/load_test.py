@@ -0,0 +1,200 @@
+"""
+Load test of the hot read paths and the chat WebSocket.
+
+Virtual users (from benchmarks/generate_data.py, picked straight from the
+database and given freshly minted tokens) hammer a running API for a fixed
+time. Each REST worker loops over a weighted mix of:
+
+    GET /matches/my-matches (first page, sometimes the next one via X-Next-Cursor)
+    GET /listings/recommendations
+    GET /chat/conversations
+    GET /chat/history/{partner_id}
+    GET /explore/feed
+
+while WebSocket clients send messages to a partner and time the save
+acknowledgement. Reports requests/s, errors and p50/p95/p99 per route.
+
+Usage (from backend/, same .env as the API, API running):
+    python benchmarks/load_test.py [--url http://localhost:8000] [--prefix bench] [--users 500]
+                                   [--concurrency 32] [--ws-clients 16] [--seconds 30]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from collections import defaultdict
+
+import httpx
+import websockets
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+from core.database import AsyncLocalSession
+from routers.auth import create_access_token
+
+ROUTE_WEIGHTS = {
+    "my-matches": 4,
+    "recommendations": 3,
+    "conversations": 2,
+    "history": 2,
+    "explore": 2,
+}
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class Recorder:
+    """Latency samples (ms) and error counts per route."""
+
+    def __init__(self):
+        self.samples: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+
+    def observe(self, route: str, started: float, ok: bool):
+        if ok:
+            self.samples[route].append((time.perf_counter() - started) * 1000)
+        else:
+            self.errors[route] += 1
+
+    def report(self, seconds: float):
+        print(f"{'route':<18} {'n':>8} {'err':>6} {'req/s':>9} {'p50':>9} {'p95':>9} {'p99':>9}")
+        for route in sorted(set(self.samples) | set(self.errors)):
+            samples = self.samples[route]
+            print(f"{route:<18} {len(samples):>8} {self.errors[route]:>6} {len(samples) / seconds:>9.1f} "
+                  f"{percentile(samples, 50):>7.2f}ms {percentile(samples, 95):>7.2f}ms "
+                  f"{percentile(samples, 99):>7.2f}ms")
+
+
+# --- 1. VIRTUAL USERS ---
+async def load_virtual_users(prefix: str, count: int) -> list[dict]:
+    """Synthetic users with a questionnaire and at least one chat partner, each with a token."""
+    async with AsyncLocalSession() as db:
+        rows = (await db.execute(text("""
+            SELECT u.id, u.username, u.token_version,
+                   (SELECT m.receiver_id FROM messages m WHERE m.sender_id = u.id LIMIT 1) AS partner_id
+            FROM users u JOIN user_vectors v ON v.user_id = u.id AND v.is_completed
+            WHERE u.username LIKE :pattern
+            ORDER BY random()
+            LIMIT :count
+        """), {"pattern": f"{prefix}\\_%", "count": count})).all()
+    users = []
+    for row in rows:
+        if row.partner_id is None:
+            continue
+        token = await create_access_token(row.username, row.id, token_version=row.token_version)
+        users.append({"id": row.id, "partner_id": row.partner_id, "token": token})
+    return users
+
+
+# --- 2. REST WORKERS ---
+async def rest_worker(client: httpx.AsyncClient, users: list[dict], stop_at: float, recorder: Recorder):
+    routes, weights = list(ROUTE_WEIGHTS), list(ROUTE_WEIGHTS.values())
+    while time.perf_counter() < stop_at:
+        user = random.choice(users)
+        headers = {"Authorization": f"Bearer {user['token']}"}
+        route = random.choices(routes, weights)[0]
+        if route == "my-matches":
+            url, params = "/matches/my-matches", {"limit": 20}
+        elif route == "recommendations":
+            url, params = "/listings/recommendations", {"limit": 20}
+        elif route == "explore":
+            url, params = "/explore/feed", {"match_limit": 10, "listing_limit": 10}
+        elif route == "conversations":
+            url, params = "/chat/conversations", {}
+        else:
+            url, params = f"/chat/history/{user['partner_id']}", {"limit": 50}
+
+        started = time.perf_counter()
+        try:
+            response = await client.get(url, params=params, headers=headers)
+            ok = response.status_code == 200
+        except httpx.HTTPError:
+            response, ok = None, False
+        recorder.observe(route, started, ok)
+
+        # Every other matches page is followed by the next one, like a scrolling client
+        if ok and route == "my-matches" and response.headers.get("X-Next-Cursor") and random.random() < 0.5:
+            started = time.perf_counter()
+            try:
+                response = await client.get(url, headers=headers, params={
+                    "limit": 20, "cursor": response.headers["X-Next-Cursor"]})
+                ok = response.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            recorder.observe("my-matches:next", started, ok)
+
+
+# --- 3. WEBSOCKET CLIENTS ---
+async def ws_client(ws_url: str, user: dict, stop_at: float, recorder: Recorder, interval: float):
+    """Sends a message, waits for its save acknowledgement, repeats."""
+    started = time.perf_counter()
+    try:
+        async with websockets.connect(f"{ws_url}/chat/ws/{user['id']}/{user['token']}") as ws:
+            recorder.observe("ws:connect", started, True)
+            while time.perf_counter() < stop_at:
+                client_id = uuid.uuid4().hex
+                started = time.perf_counter()
+                await ws.send(json.dumps({"to": user["partner_id"], "msg": "load test", "client_id": client_id}))
+                ok = False
+                # Other clients' messages arrive on the same socket: skip until our ack
+                while time.perf_counter() < stop_at + 5:
+                    try:
+                        reply = json.loads(await asyncio.wait_for(ws.recv(), timeout=5))
+                    except asyncio.TimeoutError:
+                        break
+                    if reply.get("ack") == client_id:
+                        ok = True
+                        break
+                    if reply.get("client_id") == client_id:
+                        break
+                recorder.observe("ws:message-ack", started, ok)
+                await asyncio.sleep(interval)
+    except (OSError, websockets.WebSocketException):
+        recorder.observe("ws:connect", started, False)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--prefix", default="bench", help="username prefix used by generate_data.py")
+    parser.add_argument("--users", type=int, default=500, help="virtual users to sample")
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent REST workers")
+    parser.add_argument("--ws-clients", type=int, default=16)
+    parser.add_argument("--ws-interval", type=float, default=0.1, help="seconds between messages per client")
+    parser.add_argument("--seconds", type=float, default=30)
+    args = parser.parse_args()
+
+    users = await load_virtual_users(args.prefix, args.users)
+    if not users:
+        raise SystemExit(f"❌ No '{args.prefix}' users with a questionnaire and a partner: "
+                         f"run benchmarks/generate_data.py first")
+    print(f"🚀 {len(users)} virtual users, {args.concurrency} REST workers, "
+          f"{args.ws_clients} WebSocket clients, {args.seconds:.0f}s against {args.url}")
+
+    recorder = Recorder()
+    ws_url = args.url.replace("http", "ws", 1)
+    limits = httpx.Limits(max_connections=args.concurrency + 4)
+    async with httpx.AsyncClient(base_url=args.url, timeout=60, limits=limits) as client:
+        started = time.perf_counter()
+        stop_at = started + args.seconds
+        await asyncio.gather(
+            *[rest_worker(client, users, stop_at, recorder) for _ in range(args.concurrency)],
+            *[ws_client(ws_url, users[i % len(users)], stop_at, recorder, args.ws_interval)
+              for i in range(args.ws_clients)],
+        )
+        recorder.report(time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
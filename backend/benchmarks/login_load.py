@@ -0,0 +1,78 @@
+"""
+Login burst vs. event-loop latency.
+
+Measures latency of the health check `/` on a running API, first on its
+own and then while a burst of concurrent logins hammers /auth/token.
+With bcrypt off the event loop the two p99s should stay close.
+
+Usage (from backend/, with the API running):
+    python benchmarks/login_load.py --url http://localhost:8000 [--logins 16] [--seconds 10]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+import httpx
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def probe_health(client: httpx.AsyncClient, stop_at: float, samples: list[float]):
+    while time.perf_counter() < stop_at:
+        start = time.perf_counter()
+        response = await client.get("/")
+        response.raise_for_status()
+        samples.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(0.01)
+
+
+async def login_loop(client: httpx.AsyncClient, stop_at: float, username: str, password: str, counter: list[int]):
+    while time.perf_counter() < stop_at:
+        response = await client.post("/auth/token", data={"username": username, "password": password})
+        response.raise_for_status()
+        counter[0] += 1
+
+
+async def run_phase(client: httpx.AsyncClient, seconds: float, logins: int, username: str, password: str):
+    stop_at = time.perf_counter() + seconds
+    samples: list[float] = []
+    counter = [0]
+    tasks = [probe_health(client, stop_at, samples)]
+    tasks += [login_loop(client, stop_at, username, password, counter) for _ in range(logins)]
+    await asyncio.gather(*tasks)
+    return samples, counter[0] / seconds
+
+
+def report(label: str, samples: list[float], logins_per_s: float):
+    print(f"{label:<14} n={len(samples):<6} p50={percentile(samples, 50):7.2f}ms "
+          f"p95={percentile(samples, 95):7.2f}ms p99={percentile(samples, 99):7.2f}ms "
+          f"mean={statistics.fmean(samples) if samples else 0:7.2f}ms logins/s={logins_per_s:6.1f}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--logins", type=int, default=16, help="concurrent login loops during the burst")
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    username, password = f"loadtest_{uuid.uuid4().hex[:8]}", "loadtest-password"
+    limits = httpx.Limits(max_connections=args.logins + 4)
+    async with httpx.AsyncClient(base_url=args.url, timeout=60, limits=limits) as client:
+        response = await client.post("/auth/", json={"username": username, "email": f"{username}@example.com",
+                                                      "password": password})
+        response.raise_for_status()
+
+        report("idle", *await run_phase(client, args.seconds, 0, username, password))
+        report("login burst", *await run_phase(client, args.seconds, args.logins, username, password))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,92 @@
+"""
+Recall and latency of approximate (IVF) roommate matching.
+
+Builds an in-memory MatchIndex from synthetic questionnaire answers (drawn
+from the vector_logic maps), then compares search() with the IVF backend
+at several nprobe values against the exact scan.
+
+recall@k is tie-aware: the quantized answers put many users on the same
+score, so a returned match counts as a hit when its score reaches the
+exact k-th best score, even if the exact scan picked a different user with
+that score. Scores from IVF are always exact; only the candidate set is
+approximate.
+
+Usage (from backend/):
+    python benchmarks/match_ann_recall.py [--users 1000000] [--queries 200] [--nprobe 1 2 4 8 16 32] [--nlist 0]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.config import settings
+from services.match_index import MatchIndex
+from services.vector_logic import (
+    SLEEP_MAP, CLEANLINESS_MAP, NOISE_MAP, GUEST_MAP, BUDGET_MAP, PRIORITY_MAP, DISTRICT_MAP,
+)
+
+ANSWER_MAPS = [SLEEP_MAP, CLEANLINESS_MAP, NOISE_MAP, GUEST_MAP, BUDGET_MAP, PRIORITY_MAP, DISTRICT_MAP]
+
+
+def make_vectors(count: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    columns = [rng.choice(np.asarray(list(answers.values())), count) for answers in ANSWER_MAPS]
+    return np.stack(columns, axis=1).astype(np.float64)
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run(index: MatchIndex, queries: np.ndarray, k: int, **search_kwargs):
+    """Returns per-query (scores, latency ms)."""
+    results, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        _, scores = index.search(query, k=k, **search_kwargs)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append(scores)
+    return results, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=0, help="IVF partitions (0 = sqrt(users))")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    settings.MATCH_INDEX_BACKEND = "ivf"
+    settings.MATCH_INDEX_IVF_MIN_SIZE = 1
+    settings.MATCH_INDEX_NLIST = args.nlist
+
+    index = MatchIndex()
+    start = time.perf_counter()
+    index.bulk_load(list(range(1, args.users + 1)), make_vectors(args.users, seed=42))
+    print(f"users={args.users} nlist={index._ivf.nlist} build={time.perf_counter() - start:.2f}s")
+
+    queries = make_vectors(args.queries, seed=7)
+    exact, exact_ms = run(index, queries, args.k, exact=True)
+    kth_best = [scores[-1] for scores in exact]
+    print(f"{'exact':<12} recall@{args.k}=1.000 p50={percentile(exact_ms, 50):8.2f}ms "
+          f"p99={percentile(exact_ms, 99):8.2f}ms")
+
+    for nprobe in args.nprobe:
+        approx, approx_ms = run(index, queries, args.k, nprobe=nprobe)
+        hits = [min(args.k, int((scores >= kth).sum())) for scores, kth in zip(approx, kth_best)]
+        recall = sum(hits) / (args.k * len(queries))
+        print(f"nprobe={nprobe:<5} recall@{args.k}={recall:.3f} p50={percentile(approx_ms, 50):8.2f}ms "
+              f"p99={percentile(approx_ms, 99):8.2f}ms")
+
+
+if __name__ == "__main__":
+    random.seed(0)
+    main()
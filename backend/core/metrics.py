@@ -0,0 +1,198 @@
+import contextvars
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Upper bounds of the request-latency (seconds), SQL-time (seconds) and SQL-count buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+SQL_STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# manager.stats() keys that only ever grow; the rest are point-in-time gauges
+CHAT_COUNTERS = {"messages_sent", "dropped_messages", "dropped_connections", "send_errors", "broker_expired_events"}
+
+
+class Histogram:
+    """Fixed-bucket histogram: observe() is a bisect and two additions, rendering happens on scrape."""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1) # Last slot: above every bound
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class RequestStats:
+    """SQL work done while serving the current request (filled in by core/database.py's engine hooks)."""
+
+    __slots__ = ("scope", "statements", "sql_seconds", "queries")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.statements = 0
+        self.sql_seconds = 0.0
+        self.queries = None # (seconds, statement) of each statement, only while the request is profiled
+
+    @property
+    def route(self) -> str:
+        return f"{self.scope['method']} {route_label(self.scope)}"
+
+
+# The request being served by this task, None outside requests (startup, background tasks)
+current_request: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar(
+    "current_request", default=None)
+
+
+class RequestMetrics:
+    """Per-route latency, status and SQL histograms of this worker."""
+
+    def __init__(self):
+        self.latency: Dict[Tuple[str, str], Histogram] = {}
+        self.sql_statements: Dict[Tuple[str, str], Histogram] = {}
+        self.sql_seconds: Dict[Tuple[str, str], Histogram] = {}
+        self.responses: Dict[Tuple[str, str, str], int] = {}
+
+    def observe(self, method: str, route: str, status_code: int, seconds: float, stats: RequestStats):
+        key = (method, route)
+        latency = self.latency.get(key)
+        if latency is None:
+            latency = self.latency[key] = Histogram(LATENCY_BUCKETS)
+            self.sql_statements[key] = Histogram(SQL_STATEMENT_BUCKETS)
+            self.sql_seconds[key] = Histogram(SQL_SECONDS_BUCKETS)
+        latency.observe(seconds)
+        self.sql_statements[key].observe(stats.statements)
+        self.sql_seconds[key].observe(stats.sql_seconds)
+        status_key = (method, route, str(status_code))
+        self.responses[status_key] = self.responses.get(status_key, 0) + 1
+
+
+request_metrics = RequestMetrics()
+
+
+def route_label(scope) -> str:
+    """The matched route's template (/chat/history/{partner_id}), so labels stay low-cardinality."""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware (no per-request Request object or extra task): times
+    each HTTP request and hands the engine hooks a RequestStats to fill in.
+    WebSockets pass straight through; they show up as chat gauges instead.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope)
+        token = current_request.set(stats)
+        status_code = 500 # Reported if the app raises before responding
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            current_request.reset(token)
+            request_metrics.observe(scope["method"], route_label(scope), status_code,
+                                    time.perf_counter() - started, stats)
+
+
+# --- PROMETHEUS TEXT FORMAT (built only when /metrics is scraped) ---
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _histogram_lines(name: str, buckets, counts: List[int], total: float, count: int, **labels) -> List[str]:
+    lines = []
+    cumulative = 0
+    for bound, bucket_count in zip(buckets, counts):
+        cumulative += bucket_count
+        lines.append(f"{name}_bucket{_labels(**labels, le=bound)} {cumulative}")
+    lines.append(f"{name}_bucket{_labels(**labels, le='+Inf')} {count}")
+    lines.append(f"{name}_sum{_labels(**labels)} {total}")
+    lines.append(f"{name}_count{_labels(**labels)} {count}")
+    return lines
+
+
+def _header(name: str, kind: str, description: str) -> List[str]:
+    return [f"# HELP {name} {description}", f"# TYPE {name} {kind}"]
+
+
+def _route_histograms(name: str, description: str, histograms: Dict[Tuple[str, str], Histogram]) -> List[str]:
+    lines = _header(name, "histogram", description)
+    for (method, route), histogram in sorted(histograms.items()):
+        lines += _histogram_lines(name, histogram.buckets, histogram.counts, histogram.sum, histogram.count,
+                                  method=method, route=route)
+    return lines
+
+
+def render_metrics(pool_metrics, chat_stats: Dict[str, int]) -> str:
+    """Everything this worker measures, in Prometheus text exposition format."""
+    lines = []
+
+    # 1. HTTP requests
+    lines += _route_histograms("fitnest_http_request_duration_seconds",
+                               "Time to serve a request, by route template.", request_metrics.latency)
+    lines += _header("fitnest_http_responses_total", "counter", "Responses sent, by route and status code.")
+    for (method, route, status_code), count in sorted(request_metrics.responses.items()):
+        lines.append(f"fitnest_http_responses_total{_labels(method=method, route=route, status=status_code)} {count}")
+
+    # 2. SQL per request
+    lines += _route_histograms("fitnest_db_statements_per_request",
+                               "SQL statements executed while serving one request.", request_metrics.sql_statements)
+    lines += _route_histograms("fitnest_db_seconds_per_request",
+                               "Time spent executing SQL while serving one request.", request_metrics.sql_seconds)
+
+    # 3. Connection pool (see core/database.PoolMetrics)
+    snapshot = pool_metrics.snapshot()
+    for name, value, description in [
+        ("fitnest_db_pool_size", snapshot["pool_size"], "Configured pool size."),
+        ("fitnest_db_pool_max_overflow", snapshot["max_overflow"], "Configured pool overflow."),
+        ("fitnest_db_pool_in_use", pool_metrics.in_use, "Connections checked out now."),
+        ("fitnest_db_pool_in_use_max", pool_metrics.in_use_max, "Most connections ever checked out at once."),
+    ]:
+        lines += _header(name, "gauge", description) + [f"{name} {value}"]
+    lines += _header("fitnest_db_pool_checkout_timeouts_total", "counter", "Checkouts that hit pool_timeout.")
+    lines.append(f"fitnest_db_pool_checkout_timeouts_total {pool_metrics.timeouts}")
+    lines += _header("fitnest_db_pool_checkout_wait_seconds", "histogram", "Time waited for a pooled connection.")
+    lines += _histogram_lines("fitnest_db_pool_checkout_wait_seconds", pool_metrics.WAIT_BUCKETS,
+                              pool_metrics.wait_bucket_counts, pool_metrics.wait_seconds_total, pool_metrics.checkouts)
+
+    # 4. Chat WebSockets (see services/chat_manager.ConnectionManager.stats)
+    for key, value in chat_stats.items():
+        if key in CHAT_COUNTERS:
+            name = f"fitnest_chat_{key}_total"
+            lines += _header(name, "counter", f"Chat {key.replace('_', ' ')} since start.")
+        else:
+            name = f"fitnest_chat_{key}"
+            lines += _header(name, "gauge", f"Chat {key.replace('_', ' ')} now.")
+        lines.append(f"{name} {value}")
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,151 @@
+import asyncio
+import cProfile
+import hmac
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from core.config import settings
+from core.metrics import RequestStats, current_request
+
+
+def profiling_enabled() -> bool:
+    return bool(settings.PROFILE_ADMIN_TOKEN) or settings.PROFILE_SAMPLE_RATE > 0
+
+
+def write_profile(base: str, extension: str, profiler, stacks, summary: str, queries):
+    """
+    Dumps one profile: .prof for snakeviz/flameprof, .folded for flamegraph.pl/speedscope,
+    and the SQL next to it. Then deletes the oldest files past PROFILE_MAX_FILES.
+    Blocking: runs in a worker thread.
+    """
+    os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+    if profiler is not None:
+        profiler.dump_stats(base + extension)
+    else:
+        with open(base + extension, "w") as f:
+            f.writelines(f"{stack} {count}\n" for stack, count in stacks.items())
+    with open(base + ".sql.txt", "w") as f:
+        f.write(summary)
+        f.writelines(f"{seconds * 1000:9.2f}ms  {' '.join(statement.split())}\n" for seconds, statement in queries)
+
+    # Names start with a timestamp, so name order is age order
+    names = sorted(name for name in os.listdir(settings.PROFILE_DIR)
+                   if name.endswith((".prof", ".folded", ".sql.txt")))
+    for name in names[:max(len(names) - settings.PROFILE_MAX_FILES, 0)]:
+        try:
+            os.remove(os.path.join(settings.PROFILE_DIR, name))
+        except FileNotFoundError:
+            pass # Another worker pruned it first
+
+
+class StackSampler(threading.Thread):
+    """
+    Statistical profiler: snapshots one thread's Python stack every interval
+    and counts identical stacks, ready for the folded (flamegraph.pl) format.
+    """
+
+    def __init__(self, thread_id: int, interval_seconds: float):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval_seconds = interval_seconds
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval_seconds):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+    def stop(self) -> Counter:
+        self.stopped.set()
+        self.join()
+        return self.stacks
+
+
+class ProfilingMiddleware:
+    """
+    Profiles single requests on demand: those sent with `X-Profile: <PROFILE_ADMIN_TOKEN>`
+    and a random PROFILE_SAMPLE_RATE share of the rest. One at a time per worker; the
+    file name comes back in the X-Profile-File header.
+
+    Everything the event loop runs meanwhile is in the profile, other requests included:
+    profile on a quiet worker for a clean picture. Unprofiled requests pay a header
+    lookup and a random() call.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.token = settings.PROFILE_ADMIN_TOKEN.encode()
+        self.busy = False
+
+    def wants_profile(self, scope) -> bool:
+        if self.token:
+            for name, value in scope["headers"]:
+                if name == b"x-profile":
+                    return hmac.compare_digest(value, self.token)
+        return settings.PROFILE_SAMPLE_RATE > 0 and random.random() < settings.PROFILE_SAMPLE_RATE
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.busy or not self.wants_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        path_part = scope["path"].strip("/").replace("/", "_") or "root"
+        base = os.path.join(settings.PROFILE_DIR,
+                            f"{time.strftime('%Y%m%d-%H%M%S')}-{scope['method']}-{path_part}-{uuid.uuid4().hex[:6]}")
+        extension = ".prof" if settings.PROFILE_MODE == "cprofile" else ".folded"
+
+        async def send_with_file(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-profile-file", os.path.basename(base + extension).encode())]
+            await send(message)
+
+        # 1. Collect this request's SQL alongside the Python profile
+        stats = current_request.get()
+        token = None
+        if stats is None:
+            stats = RequestStats(scope)
+            token = current_request.set(stats)
+        stats.queries = []
+
+        # 2. Profile the request
+        self.busy = True
+        started = time.perf_counter()
+        profiler = sampler = None
+        try:
+            if settings.PROFILE_MODE == "cprofile":
+                profiler = cProfile.Profile()
+                profiler.enable()
+            else:
+                sampler = StackSampler(threading.get_ident(), settings.PROFILE_SAMPLE_INTERVAL_MS / 1000)
+                sampler.start()
+            await self.app(scope, receive, send_with_file)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            stacks = sampler.stop() if sampler is not None else None
+            elapsed = time.perf_counter() - started
+            if token is not None:
+                current_request.reset(token)
+            self.busy = False
+
+            # 3. Dump off the event loop. A failure here must not replace the request's own exception
+            summary = (f"{scope['method']} {scope['path']}: {elapsed * 1000:.1f}ms total, "
+                       f"{len(stats.queries)} statements, {stats.sql_seconds * 1000:.1f}ms in SQL\n\n")
+            try:
+                await asyncio.to_thread(write_profile, base, extension, profiler, stacks, summary, stats.queries)
+                print(f"🔬 Profiled {scope['method']} {scope['path']} ({elapsed * 1000:.0f}ms) -> {base + extension}")
+            except Exception as e:
+                print(f"⚠️ Could not write the profile of {scope['method']} {scope['path']}: {e}")
@@ -0,0 +1,35 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from passlib.context import CryptContext
+from core.config import settings
+
+# Cost comes from settings; hashes made with another cost are upgraded on the next login
+bycrypt_context = CryptContext(schemes=['bcrypt'], bcrypt__rounds=settings.BCRYPT_ROUNDS)
+
+# bcrypt releases the GIL, so a small thread pool keeps hashing off the event loop
+# and doubles as the cap on how many hashes run at once
+_hash_pool = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_CONCURRENCY,
+                                thread_name_prefix="password-hash")
+
+
+def truncate_password(password: str) -> str:
+    # Bcrypt max password length is 72 bytes - truncate at byte level, not character level
+    password_bytes = password.encode('utf-8')[:72]
+    return password_bytes.decode('utf-8', errors='ignore')
+
+
+async def hash_password(password: str) -> str:
+    """Hashes a password in the hashing pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_pool, bycrypt_context.hash, truncate_password(password))
+
+
+async def verify_password(password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """
+    Verifies a password in the hashing pool.
+    Returns (valid, new_hash); new_hash is set when the stored hash used an
+    outdated cost and should be replaced.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _hash_pool, bycrypt_context.verify_and_update, truncate_password(password), hashed_password)
@@ -0,0 +1,121 @@
+"""
+Bulk-imports a partner listing feed (CSV, JSON Lines or JSON).
+
+Rows are streamed in chunks and upserted with INSERT ... ON CONFLICT on the
+(source, external_id) natural key, one transaction per chunk. Re-running the
+same feed is safe: unchanged rows are skipped, changed rows are updated.
+
+Each row needs: external_id (or id), title, price, size, district.
+Optional: images, features ('|'-separated in CSV, lists in JSON), description.
+
+Usage (from backend/):
+    python import_listings.py feed.csv --source partner_a --owner-id 1
+    python import_listings.py feed.jsonl --source partner_b --owner-id 1 --chunk-size 2000
+"""
+import argparse
+import asyncio
+import csv
+import json
+import sys
+import os
+import time
+from itertools import islice
+from typing import Dict, Iterator, List, Optional
+
+# Ensure we can import from folders like 'routers' and 'models'
+sys.path.append(os.getcwd())
+
+from core.database import AsyncLocalSession
+from models.user import User  # noqa: F401 (Listing.owner relationship)
+from services.listing_service import bulk_upsert_listings
+
+
+# --- 1. READERS (one dict per feed row, never the whole file for CSV/JSONL) ---
+def read_feed(path: str) -> Iterator[Dict]:
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        with open(path, newline="", encoding="utf-8") as f:
+            yield from csv.DictReader(f)
+    elif extension in (".jsonl", ".ndjson"):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    elif extension == ".json":
+        # A plain JSON array has to be parsed whole; prefer JSON Lines for big feeds
+        with open(path, encoding="utf-8") as f:
+            yield from json.load(f)
+    else:
+        raise SystemExit(f"❌ Unsupported feed type: {extension} (use .csv, .jsonl, .ndjson or .json)")
+
+
+def _as_list(value) -> List:
+    if value is None or value == "":
+        return []
+    if isinstance(value, str):
+        return [item.strip() for item in value.split("|") if item.strip()]
+    return list(value)
+
+
+def to_listing_row(raw: Dict, source: str, owner_id: int) -> Optional[Dict]:
+    """Feed row -> listings row, or None when a required field is missing or invalid."""
+    try:
+        external_id = raw.get("external_id", raw.get("id"))
+        external_id = "" if external_id is None else str(external_id).strip()
+        title = str(raw.get("title") or "").strip()
+        district = str(raw.get("district") or "").strip()
+        price = int(float(raw["price"]))
+        size = int(float(raw["size"]))
+    except (KeyError, TypeError, ValueError):
+        return None
+    if not external_id or not title or not district or price <= 0 or size <= 0:
+        return None
+    return {
+        "source": source,
+        "external_id": external_id,
+        "owner_id": owner_id,
+        "title": title,
+        "price": price,
+        "size": size,
+        "district": district,
+        "images": _as_list(raw.get("images")),
+        "features": _as_list(raw.get("features")),
+        "description": raw.get("description") or None,
+    }
+
+
+# --- 2. IMPORT ---
+async def import_feed(path: str, source: str, owner_id: int, chunk_size: int):
+    chunk_size = max(1, chunk_size)
+    print(f"📦 Importing {path} as source '{source}' in chunks of {chunk_size}...")
+    started = time.perf_counter()
+    imported = rejected = 0
+
+    feed = read_feed(path)
+    async with AsyncLocalSession() as db:
+        while True:
+            raw_rows = list(islice(feed, chunk_size))
+            if not raw_rows:
+                break
+            rows = [row for row in (to_listing_row(raw, source, owner_id) for raw in raw_rows) if row]
+            rejected += len(raw_rows) - len(rows)
+
+            imported += await bulk_upsert_listings(db, rows)
+            await db.commit()
+
+            elapsed = time.perf_counter() - started
+            print(f"   {imported} rows ({imported / elapsed:.0f} rows/s), {rejected} rejected")
+
+    elapsed = time.perf_counter() - started
+    print(f"🎉 Imported {imported} listings in {elapsed:.1f}s "
+          f"({imported / elapsed if elapsed else 0:.0f} rows/s), {rejected} rows rejected")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk-import a listing feed.")
+    parser.add_argument("path", help="Feed file: .csv, .jsonl/.ndjson or .json")
+    parser.add_argument("--source", required=True, help="Feed name; with external_id it identifies a listing")
+    parser.add_argument("--owner-id", type=int, required=True, help="User that owns the imported listings")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Rows per INSERT and per transaction")
+    args = parser.parse_args()
+    asyncio.run(import_feed(args.path, args.source, args.owner_id, args.chunk_size))
@@ -1,20 +1,37 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from contextlib import asynccontextmanager
-from core.database import init_db
-from routers import auth, listings, matches, chat, test, onboarding
+from core.config import settings
+from core.database import init_db, pool_metrics
+from core.metrics import MetricsMiddleware, PROMETHEUS_CONTENT_TYPE, render_metrics
+from core.profiling import ProfilingMiddleware, profiling_enabled
+from routers import auth, listings, matches, chat, test, onboarding, explore
+from services.message_sink import message_sink
+from services.chat_manager import manager
+from services.top_matches import finish_top_matches_updates
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print("🚀 Starting Fitness API...")
     try:
-        await init_db()
-        print("✅ Database connected & Tables have been created.")
+        schema_status = await init_db()
+        print(f"✅ Database connected & {schema_status}.")
     except Exception as e:
-        print(f"❌ Failed to connect to the database: {e}")
+        # Serving against a missing or wrongly migrated schema only fails later, request by request
+        print(f"❌ Database not ready, refusing to start: {e}")
+        raise
+    await message_sink.start()
+    try:
+        await manager.start()
+    except Exception as e:
+        print(f"❌ Failed to start the chat broker, retrying in the background: {e}")
     yield
     print("🛑 Shutting down Fitness API")
+    await manager.stop()
+    await message_sink.stop() # Flush queued chat messages before exit
+    await finish_top_matches_updates()
 
 app = FastAPI(title="Fitnest", description="A web application dedicated to room and friend matching.",
               version="1.0.0", lifespan=lifespan)
@@ -22,7 +39,13 @@ app = FastAPI(title="Fitnest", description="A web application dedicated to room
 origins = ["http://localhost:3000", "http://localhost:5173", "http://localhost:8000/chat/conversations", "https://fitnest-frontend-opsx.onrender.com"]
 
 app.add_middleware(CORSMiddleware, allow_origins=["*"],
-                   allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
+                   allow_credentials=True, allow_methods=["*"], allow_headers=["*"],
+                   expose_headers=["X-Next-Cursor"])
+if profiling_enabled():
+    app.add_middleware(ProfilingMiddleware)
+if settings.METRICS_ENABLED or settings.DB_SLOW_QUERY_MS > 0:
+    # Outermost, so the latency includes CORS and every other middleware (also tags slow queries with their route)
+    app.add_middleware(MetricsMiddleware)
 
 # Include all routers
 app.include_router(auth.router)
@@ -31,7 +54,18 @@ app.include_router(matches.router)
 app.include_router(chat.router)
 app.include_router(test.router)
 app.include_router(onboarding.router)
+app.include_router(explore.router)
 
 @app.get("/")
 async def health_check():
     return {"status": "active", "project": "Fitnest"}
+
+@app.get("/health/db")
+async def database_pool_health():
+    """Connection pool usage and checkout waits for this worker."""
+    return pool_metrics.snapshot()
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus scrape endpoint: request latency, SQL per request, pool and chat gauges of this worker."""
+    return PlainTextResponse(render_metrics(pool_metrics, manager.stats()), media_type=PROMETHEUS_CONTENT_TYPE)
@@ -0,0 +1,84 @@
+"""listing scoring columns, conversation keys, read cursors, token_version
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-16
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, Sequence[str], None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Frozen copy of services/listing_matching.DISTRICT_MAP for the backfill
+DISTRICT_VALUES = {
+    "District 1": 0.0,
+    "District 3": 0.1,
+    "District 4": 0.2,
+    "District 5": 0.3,
+    "Binh Thanh": 0.4,
+    "District 7": 0.6,
+    "Thu Duc": 0.8,
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 1. Access tokens carry token_version
+    op.add_column("users", sa.Column("token_version", sa.Integer(), server_default="0", nullable=False))
+
+    # 2. Listing scoring inputs, backfilled the way listing_matching computes them
+    op.add_column("listings", sa.Column("location_value", sa.Float(), server_default="0.5", nullable=False))
+    op.add_column("listings", sa.Column("price_bucket", sa.Float(), server_default="1.0", nullable=False))
+    district_cases = " ".join(
+        f"WHEN '{district}' THEN {value}" for district, value in DISTRICT_VALUES.items())
+    op.execute(f"""
+        UPDATE listings SET
+            location_value = CASE district {district_cases} ELSE 0.5 END,
+            price_bucket = CASE
+                WHEN price < 1500000 THEN 0.0
+                WHEN price < 2000000 THEN 0.33
+                WHEN price < 3000000 THEN 0.66
+                ELSE 1.0
+            END
+    """)
+    op.create_index("ix_listings_location_value_price_bucket", "listings", ["location_value", "price_bucket"])
+
+    # 3. Conversation key for history/inbox queries (rewrites the messages table once)
+    op.add_column("messages", sa.Column(
+        "user_low", sa.Integer(), sa.Computed("LEAST(sender_id, receiver_id)", persisted=True)))
+    op.add_column("messages", sa.Column(
+        "user_high", sa.Integer(), sa.Computed("GREATEST(sender_id, receiver_id)", persisted=True)))
+    op.create_index("ix_messages_conversation_timestamp", "messages",
+                    ["user_low", "user_high", "timestamp", "id"])
+
+    # 4. Read cursors
+    op.create_table(
+        "conversation_reads",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("partner_id", sa.Integer(), nullable=False),
+        sa.Column("last_read_message_id", sa.Integer(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.ForeignKeyConstraint(["partner_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("user_id", "partner_id"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("conversation_reads")
+    op.drop_index("ix_messages_conversation_timestamp", table_name="messages")
+    op.drop_column("messages", "user_high")
+    op.drop_column("messages", "user_low")
+    op.drop_index("ix_listings_location_value_price_bucket", table_name="listings")
+    op.drop_column("listings", "price_bucket")
+    op.drop_column("listings", "location_value")
+    op.drop_column("users", "token_version")
@@ -0,0 +1,43 @@
+"""indexes for the hot queries
+
+Built CONCURRENTLY so live tables keep taking writes while they build.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-16
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, Sequence[str], None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    # Direct lookups of messages between two users, newest last
+    ("ix_messages_sender_receiver_timestamp", "messages", ["sender_id", "receiver_id", "timestamp"]),
+    # Matching candidate pool: completed questionnaires only
+    ("ix_user_vectors_is_completed", "user_vectors", ["is_completed"]),
+    # Listing browse/filter by district and price
+    ("ix_listings_district_price", "listings", ["district", "price"]),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, _ in INDEXES:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,46 @@
+"""typed district/budget on user_vectors and gender index for match filters
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-16
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, Sequence[str], None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("user_vectors", sa.Column("district", sa.String(), nullable=True))
+    op.add_column("user_vectors", sa.Column("budget", sa.String(), nullable=True))
+    op.execute("""
+        UPDATE user_vectors SET
+            district = responses ->> 'district',
+            budget = responses ->> 'budget'
+        WHERE responses IS NOT NULL
+    """)
+
+    with op.get_context().autocommit_block():
+        op.create_index("ix_user_vectors_district_budget", "user_vectors", ["district", "budget"],
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.create_index("ix_users_gender", "users", ["gender"],
+                        postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_users_gender", table_name="users", postgresql_concurrently=True, if_exists=True)
+        op.drop_index("ix_user_vectors_district_budget", table_name="user_vectors",
+                      postgresql_concurrently=True, if_exists=True)
+    op.drop_column("user_vectors", "budget")
+    op.drop_column("user_vectors", "district")
@@ -0,0 +1,46 @@
+"""precomputed top-N match lists
+
+Lists start out unbuilt (top_match_floor NULL) and my-matches falls back to
+the in-memory index for them: run `python rebuild_top_matches.py` once.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-16
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, Sequence[str], None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "user_top_matches",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("match_user_id", sa.Integer(), nullable=False),
+        sa.Column("score", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.ForeignKeyConstraint(["match_user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("user_id", "match_user_id"),
+    )
+    op.create_index("ix_user_top_matches_user_score", "user_top_matches",
+                    ["user_id", sa.text("score DESC"), "match_user_id"])
+
+    op.add_column("user_vectors", sa.Column("top_match_floor", sa.Integer(), nullable=True))
+    op.create_index("ix_user_vectors_top_match_floor", "user_vectors", ["top_match_floor"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_user_vectors_top_match_floor", table_name="user_vectors")
+    op.drop_column("user_vectors", "top_match_floor")
+    op.drop_table("user_top_matches")
@@ -0,0 +1,71 @@
+"""store embeddings as packed float64 bytea with a precomputed norm
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import numpy as np
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, Sequence[str], None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+NORM_BATCH = 10000
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("user_vectors", sa.Column("vector_packed", sa.LargeBinary(), nullable=True))
+    op.add_column("user_vectors", sa.Column("embedding_norm", sa.Float(), nullable=True))
+    # float8send() is big-endian float64, the layout models/types.PackedVector reads
+    op.execute("""
+        UPDATE user_vectors v SET vector_packed = p.packed
+        FROM (
+            SELECT user_id,
+                   string_agg(float8send(e.value::float8), ''::bytea ORDER BY e.ordinality) AS packed
+            FROM user_vectors, jsonb_array_elements_text(vector_data_embeddings) WITH ORDINALITY AS e(value, ordinality)
+            WHERE jsonb_typeof(vector_data_embeddings) = 'array'
+            GROUP BY user_id
+        ) p
+        WHERE v.user_id = p.user_id
+    """)
+    op.drop_column("user_vectors", "vector_data_embeddings")
+    op.alter_column("user_vectors", "vector_packed", new_column_name="vector_data_embeddings")
+
+    # Norms in Python: they must be bit-identical to np.linalg.norm, which SQL's sqrt(sum()) is not
+    bind = op.get_bind()
+    rows = bind.execute(sa.text(
+        "SELECT user_id, vector_data_embeddings FROM user_vectors WHERE vector_data_embeddings IS NOT NULL")).all()
+    for start in range(0, len(rows), NORM_BATCH):
+        batch = rows[start:start + NORM_BATCH]
+        bind.execute(sa.text("""
+            UPDATE user_vectors v SET embedding_norm = n.norm
+            FROM unnest(CAST(:user_ids AS integer[]), CAST(:norms AS float8[])) AS n(user_id, norm)
+            WHERE v.user_id = n.user_id
+        """), {"user_ids": [user_id for user_id, _ in batch],
+              "norms": [float(np.linalg.norm(np.frombuffer(packed, dtype=">f8"))) for _, packed in batch]})
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.add_column("user_vectors", sa.Column("vector_json", postgresql.JSONB(), nullable=True))
+    # No SQL function turns float8 bytes back into numbers: decode in Python
+    bind = op.get_bind()
+    rows = bind.execute(sa.text(
+        "SELECT user_id, vector_data_embeddings FROM user_vectors WHERE vector_data_embeddings IS NOT NULL")).all()
+    table = sa.table("user_vectors", sa.column("user_id", sa.Integer), sa.column("vector_json", postgresql.JSONB))
+    for user_id, packed in rows:
+        bind.execute(table.update().where(table.c.user_id == user_id).values(
+            vector_json=np.frombuffer(packed, dtype=">f8").tolist()))
+    op.drop_column("user_vectors", "embedding_norm")
+    op.drop_column("user_vectors", "vector_data_embeddings")
+    op.alter_column("user_vectors", "vector_json", new_column_name="vector_data_embeddings")
@@ -0,0 +1,41 @@
+"""natural key (source, external_id) for imported listings
+
+The unique index is built CONCURRENTLY, then attached as the constraint that
+`INSERT ... ON CONFLICT` in import_listings.py targets. Existing listings keep
+NULLs, which Postgres never treats as duplicates.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: Union[str, Sequence[str], None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("listings", sa.Column("source", sa.String(), nullable=True))
+    op.add_column("listings", sa.Column("external_id", sa.String(), nullable=True))
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        op.create_index("uq_listings_source_external_id", "listings", ["source", "external_id"],
+                        unique=True, postgresql_concurrently=True, if_not_exists=True)
+    op.execute("ALTER TABLE listings ADD CONSTRAINT uq_listings_source_external_id "
+               "UNIQUE USING INDEX uq_listings_source_external_id")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint("uq_listings_source_external_id", "listings", type_="unique")
+    op.drop_column("listings", "external_id")
+    op.drop_column("listings", "source")
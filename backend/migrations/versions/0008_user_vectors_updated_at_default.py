@@ -0,0 +1,34 @@
+"""server default for user_vectors.updated_at, backfilling NULLs
+
+Rows inserted without updated_at (COPY, raw INSERTs) were NULL and never
+matched the `updated_at >= watermark` refresh of services/match_index.py,
+so other workers never picked them up. Backfilled rows get now(), which the
+next refresh of every worker sees.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0008"
+down_revision: Union[str, Sequence[str], None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.alter_column("user_vectors", "updated_at", server_default=sa.text("now()"))
+    op.execute("UPDATE user_vectors SET updated_at = now() WHERE updated_at IS NULL")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.alter_column("user_vectors", "updated_at", server_default=None)
@@ -6,12 +6,13 @@ import os
 sys.path.append(os.getcwd())
 
 from sqlalchemy import select
-from core.database import AsyncLocalSession, engine, Base
-from models.listing import Listing
+from core.database import AsyncLocalSession, init_db
+from models.listing import Listing  # noqa: F401 (User.listings relationship)
 from models.user import User
+from services.listing_service import bulk_upsert_listings
 
-# 🟢 FIX: Import the hash tool from your existing auth.py
-from routers.auth import bycrypt_context 
+# 🟢 FIX: Import the hash tool used by auth.py
+from core.security import bycrypt_context
 
 # --- MOCK DATA ---
 LISTINGS_DATA = [
@@ -65,9 +66,12 @@ LISTINGS_DATA = [
 async def seed():
     print("🌱 Starting Seed Process...")
 
-    # 1. Create Tables
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    # 1. Same schema check as the API's startup: tables come from `alembic upgrade head`,
+    # so a fresh database gets its alembic_version row (DB_SCHEMA_MODE="create_all" still applies)
+    try:
+        print(f"✅ {await init_db()}")
+    except RuntimeError as e:
+        raise SystemExit(f"❌ {e}")
 
     async with AsyncLocalSession() as db:
         # 2. Create Dummy Host
@@ -77,7 +81,7 @@ async def seed():
         if not host:
             print("👤 Creating dummy host user...")
             
-            # 🟢 FIX: Use the hash feature from auth.py
+            # 🟢 FIX: Use the same hash settings as auth.py
             hashed_pw = bycrypt_context.hash("password123")
             
             host = User(
@@ -96,21 +100,12 @@ async def seed():
         
         print(f"✅ Using Host ID: {host.id}")
 
-        # 3. Insert Listings
-        print(f"📦 Inserting {len(LISTINGS_DATA)} listings...")
-        
-        for item in LISTINGS_DATA:
-            # Check for duplicates
-            existing = await db.execute(select(Listing).where(Listing.title == item["title"]))
-            if existing.scalars().first():
-                continue
-
-            listing = Listing(
-                owner_id=host.id,
-                **item
-            )
-            db.add(listing)
-        
+        # 3. Upsert Listings (keyed by title, so re-running the seed is a no-op)
+        print(f"📦 Upserting {len(LISTINGS_DATA)} listings...")
+        await bulk_upsert_listings(db, [
+            {**item, "owner_id": host.id, "source": "mock", "external_id": item["title"]}
+            for item in LISTINGS_DATA
+        ])
         await db.commit()
         print("🎉 Listings inserted successfully!")
 
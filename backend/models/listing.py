@@ -1,6 +1,8 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Text, JSON
+from sqlalchemy import (BigInteger, CheckConstraint, Column, Integer, String, ForeignKey, Text, JSON, Float, Index,
+                        UniqueConstraint, event)
 from sqlalchemy.orm import relationship
 from core.database import Base
+from services.listing_matching import listing_location_value, normalize_listing_price
 
 class Listing(Base):
     __tablename__ = "listings"
@@ -17,6 +19,40 @@ class Listing(Base):
     images = Column(JSON, default=[]) 
     features = Column(JSON, default=[])
     description = Column(Text, nullable=True)
+
+    # Natural key of imported listings (feed name + the partner's id); NULL for listings made in the app
+    source = Column(String, nullable=True)
+    external_id = Column(String, nullable=True)
+
+    # Pre-computed scoring inputs (0-1 scale), kept in sync with district/price below
+    location_value = Column(Float, nullable=False, default=0.5)
+    price_bucket = Column(Float, nullable=False, default=1.0)
     
     # Relationship
-    owner = relationship("User", back_populates="listings")
\ No newline at end of file
+    owner = relationship("User", back_populates="listings")
+
+    __table_args__ = (
+        Index("ix_listings_location_value_price_bucket", "location_value", "price_bucket"),
+        Index("ix_listings_district_price", "district", "price"),
+        UniqueConstraint("source", "external_id", name="uq_listings_source_external_id"),
+    )
+
+
+class ListingsVersion(Base):
+    """Single row counting listing changes; cached recommendations are keyed by it (see listing_service)."""
+    __tablename__ = "listings_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(BigInteger, nullable=False, server_default="0")
+
+    __table_args__ = (
+        CheckConstraint("id = 1", name="ck_listings_version_single_row"),
+    )
+
+
+@event.listens_for(Listing, "before_insert")
+@event.listens_for(Listing, "before_update")
+def sync_scoring_columns(mapper, connection, target: Listing):
+    """Keeps location_value/price_bucket in step with district/price on every ORM write."""
+    target.location_value = listing_location_value(target.district)
+    target.price_bucket = normalize_listing_price(target.price)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Computed, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from core.database import Base
@@ -12,6 +12,31 @@ class Message(Base):
     content = Column(Text, nullable=False)
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
 
+    # Conversation key: the same (low, high) pair for both directions, filled in by Postgres
+    user_low = Column(Integer, Computed("LEAST(sender_id, receiver_id)", persisted=True))
+    user_high = Column(Integer, Computed("GREATEST(sender_id, receiver_id)", persisted=True))
+
     # Relationships (Optional, but good for queries)
     sender = relationship("User", foreign_keys=[sender_id])
-    receiver = relationship("User", foreign_keys=[receiver_id])
\ No newline at end of file
+    receiver = relationship("User", foreign_keys=[receiver_id])
+
+    __table_args__ = (
+        # One range scan per history page, whatever the thread length
+        Index("ix_messages_conversation_timestamp", "user_low", "user_high", "timestamp", "id"),
+        Index("ix_messages_sender_receiver_timestamp", "sender_id", "receiver_id", "timestamp"),
+    )
+
+    @staticmethod
+    def conversation_key(user_a: int, user_b: int) -> tuple[int, int]:
+        """(user_low, user_high) of the conversation between two users."""
+        return min(user_a, user_b), max(user_a, user_b)
+
+
+class ConversationRead(Base):
+    """Per-user read cursor for one conversation: everything up to last_read_message_id is read."""
+    __tablename__ = "conversation_reads"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    partner_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    last_read_message_id = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
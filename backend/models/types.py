@@ -0,0 +1,38 @@
+from typing import Optional, Sequence
+
+import numpy as np
+from sqlalchemy import LargeBinary
+from sqlalchemy.types import TypeDecorator
+
+# Big-endian float64, the byte layout of Postgres' float8send(): migrations can
+# build and read it in SQL, and 0.33/0.66 answers keep their exact float value
+VECTOR_DTYPE = np.dtype(">f8")
+
+
+def pack_vector(vector: Sequence[float]) -> bytes:
+    return np.asarray(vector, dtype=VECTOR_DTYPE).tobytes()
+
+
+def unpack_vectors(blobs: Sequence[bytes], dim: int) -> np.ndarray:
+    """Many packed vectors -> one (n, dim) float64 matrix, without per-row decoding."""
+    return np.frombuffer(b"".join(blobs), dtype=VECTOR_DTYPE).reshape(-1, dim).astype(np.float64)
+
+
+class PackedVector(TypeDecorator):
+    """
+    A float vector stored as packed bytes (bytea).
+    Python side: write any sequence of floats, read back a float64 ndarray.
+    """
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value: Optional[Sequence[float]], dialect) -> Optional[bytes]:
+        if value is None:
+            return None
+        return pack_vector(value)
+
+    def process_result_value(self, value: Optional[bytes], dialect) -> Optional[np.ndarray]:
+        if value is None:
+            return None
+        return np.frombuffer(value, dtype=VECTOR_DTYPE).astype(np.float64)
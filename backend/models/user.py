@@ -1,8 +1,9 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Text, Index, Float
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from core.database import Base
+from models.types import PackedVector
 
 class User(Base):
     __tablename__ = "users"
@@ -14,11 +15,13 @@ class User(Base):
     
     full_name = Column(String, nullable=True)
     age = Column(Integer, nullable=True)
-    gender = Column(String, nullable=True)
+    gender = Column(String, nullable=True, index=True)
     university = Column(String, nullable=True)
     major = Column(String, nullable=True)
     bio = Column(Text, nullable=True)
     profile_completed = Column(Boolean, default=False) 
+    # Part of every access token; bumping it invalidates the user's tokens and cached row
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
     
     # Relationships
     vector = relationship("UserVector", back_populates="user", uselist=False)
@@ -30,11 +33,38 @@ class UserVector(Base):
     user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
     
     responses = Column(JSONB, nullable=True)
+    # Typed copies of the answers used as hard match filters (set alongside responses)
+    district = Column(String, nullable=True)
+    budget = Column(String, nullable=True)
     
-    vector_data_embeddings = Column(JSONB, nullable=True)
+    # Packed float64 (see models/types.py) plus its precomputed L2 norm
+    vector_data_embeddings = Column(PackedVector, nullable=True)
+    embedding_norm = Column(Float, nullable=True)
     
-    is_completed = Column(Boolean, default=False)
+    is_completed = Column(Boolean, default=False, index=True)
+
+    # Score a newcomer must reach to enter this user's user_top_matches list:
+    # the N-th score when the list is full, -1 while it holds the whole pool, NULL if never built
+    top_match_floor = Column(Integer, nullable=True, index=True)
     
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
-    user = relationship("User", back_populates="vector")
\ No newline at end of file
+    user = relationship("User", back_populates="vector")
+
+    __table_args__ = (
+        Index("ix_user_vectors_district_budget", "district", "budget"),
+    )
+
+
+class UserTopMatch(Base):
+    """One entry of a user's precomputed top-N matches (see services/top_matches.py)."""
+    __tablename__ = "user_top_matches"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    match_user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    score = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        # A user's list, best first: the exact order of /matches/my-matches
+        Index("ix_user_top_matches_user_score", "user_id", score.desc(), "match_user_id"),
+    )
\ No newline at end of file
@@ -0,0 +1,111 @@
+"""
+Rebuilds user_top_matches for every completed questionnaire.
+
+Run after the table is first created, after a bulk import of users, or
+whenever TOP_MATCHES_SIZE changes. Day to day the lists are maintained
+incrementally by /test/submit.
+
+Answers are quantized, so many users share the exact same vector (and so the
+same ranking): the pool is scored once per distinct vector, not once per user.
+The old lists stay readable until the rebuild commits.
+
+Usage (from backend/):
+    python rebuild_top_matches.py
+"""
+import asyncio
+import io
+import sys
+import os
+import time
+
+# Ensure we can import from folders like 'routers' and 'models'
+sys.path.append(os.getcwd())
+
+import numpy as np
+from sqlalchemy import delete, text
+
+from core.config import settings
+from core.database import AsyncLocalSession
+from models.listing import Listing  # noqa: F401 (User.listings relationship)
+from models.user import UserTopMatch
+from services.match_index import match_index
+from services.top_matches import lock_top_matches
+
+COPY_CHUNK_ROWS = 500_000
+
+
+async def copy_rows(db, user_ids: np.ndarray, match_ids: np.ndarray, scores: np.ndarray):
+    """Streams rows into user_top_matches with COPY (CSV built by numpy, not per-row Python)."""
+    buffer = io.BytesIO()
+    np.savetxt(buffer, np.column_stack([user_ids, match_ids, scores]), fmt="%d", delimiter=",")
+    buffer.seek(0)
+    conn = await db.connection()
+    raw = await conn.get_raw_connection()
+    await raw.driver_connection.copy_to_table(
+        "user_top_matches", source=buffer, columns=["user_id", "match_user_id", "score"], format="csv")
+
+
+async def rebuild():
+    print("🔁 Rebuilding user_top_matches...")
+    started = time.perf_counter()
+    size = settings.TOP_MATCHES_SIZE
+
+    async with AsyncLocalSession() as db:
+        # 1. Wait out incremental updates (held until commit), then load every vector
+        await lock_top_matches(db)
+        await match_index.sync(db)
+        user_ids = match_index.user_ids.copy()
+        distinct, inverse = np.unique(match_index.raw_vectors, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        print(f"📊 {len(user_ids)} users, {len(distinct)} distinct answer vectors")
+
+        # 2. Replace the lists inside one transaction (DELETE, not TRUNCATE, so readers aren't blocked)
+        await db.execute(delete(UserTopMatch))
+
+        order = np.argsort(inverse, kind="stable")
+        groups = np.split(user_ids[order], np.cumsum(np.bincount(inverse, minlength=len(distinct)))[:-1])
+        pending = ([], [], [])
+        pending_rows = 0
+        for group, vector in enumerate(distinct):
+            members = groups[group]
+            # One extra entry so a member can drop itself and still have N
+            top_ids, top_scores = match_index.search(vector, k=size + 1, exact=True)
+
+            head_ids, head_scores = top_ids[:size], top_scores[:size]
+            in_head = np.isin(members, head_ids)
+            # Members outside the head share it unchanged
+            outside = members[~in_head]
+            pending[0].append(np.repeat(outside, len(head_ids)))
+            pending[1].append(np.tile(head_ids, len(outside)))
+            pending[2].append(np.tile(head_scores, len(outside)))
+            pending_rows += len(outside) * len(head_ids)
+            # Members inside it (at most N) get the N+1 list without themselves
+            for member in members[in_head]:
+                keep = top_ids != member
+                ids, scores = top_ids[keep][:size], top_scores[keep][:size]
+                pending[0].append(np.full(len(ids), member))
+                pending[1].append(ids)
+                pending[2].append(scores)
+                pending_rows += len(ids)
+
+            if pending_rows >= COPY_CHUNK_ROWS or group == len(distinct) - 1:
+                if pending_rows:
+                    await copy_rows(db, *(np.concatenate(part) for part in pending))
+                pending = ([], [], [])
+                pending_rows = 0
+                print(f"   {group + 1}/{len(distinct)} vectors done")
+
+        # 3. Floors: the N-th score of full lists, -1 for lists holding the whole pool
+        await db.execute(text("UPDATE user_vectors SET top_match_floor = -1 WHERE is_completed = true"))
+        await db.execute(text("""
+            UPDATE user_vectors v SET top_match_floor = f.floor
+            FROM (SELECT user_id, min(score) AS floor FROM user_top_matches
+                  GROUP BY user_id HAVING count(*) >= :size) f
+            WHERE v.user_id = f.user_id
+        """), {"size": size})
+        await db.commit()
+
+    print(f"🎉 Rebuilt top-{size} lists in {time.perf_counter() - started:.1f}s")
+
+if __name__ == "__main__":
+    asyncio.run(rebuild())
@@ -1,23 +1,23 @@
 from datetime import datetime, timedelta, timezone
 from typing import Annotated
 from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel, EmailStr
-from sqlalchemy import select
+from pydantic import BaseModel, ConfigDict, EmailStr
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from core.database import get_db
 from models.user import User
 from starlette import status
-from passlib.context import CryptContext
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
 from jose import jwt, JWTError
 from core.config import settings
+from core.security import hash_password, verify_password
+from core.cache import TTLCache
 
 router = APIRouter(prefix="/auth", tags=['auth'])
 
 SECRET_KEY = settings.SECRET_KEY
 ALGORITHM = settings.ALGORITHM
 
-bycrypt_context = CryptContext(schemes=['bcrypt'])
 OAuth2Bearer = OAuth2PasswordBearer(tokenUrl="auth/token")
 
 
@@ -27,6 +27,11 @@ class CreateUserRequest(BaseModel):
     password: str
 
 
+class ChangePasswordRequest(BaseModel):
+    current_password: str
+    new_password: str
+
+
 class Token(BaseModel):
     access_token: str
     token_type: str
@@ -40,16 +45,20 @@ async def authenticate_user(db: db_dependencies, username: str, password: str):
     user = result.scalar_one_or_none()
     if not user:
         return False
-    # Bcrypt max password length is 72 bytes - truncate at byte level, not character level
-    password_bytes = password.encode('utf-8')[:72]
-    password_truncated = password_bytes.decode('utf-8', errors='ignore')
-    if not bycrypt_context.verify(password_truncated, str(user.hashed_password)):
+    # Bcrypt runs in the hashing pool so a login burst does not block the event loop
+    verified, new_hash = await verify_password(password, str(user.hashed_password))
+    if not verified:
         return False
+    if new_hash:
+        # Stored hash used an old BCRYPT_ROUNDS: upgrade it transparently
+        user.hashed_password = new_hash
+        await db.commit()
     return user
 
 
-async def create_access_token(username: str, user_id: int, expires_data: timedelta | None = None):
-    to_encode = {'sub': username, 'id': user_id}
+async def create_access_token(username: str, user_id: int, expires_data: timedelta | None = None,
+                              token_version: int = 0):
+    to_encode = {'sub': username, 'id': user_id, 'ver': token_version}
     if expires_data:
         expire = datetime.now(timezone.utc) + expires_data
     else:
@@ -59,32 +68,88 @@ async def create_access_token(username: str, user_id: int, expires_data: timedel
     return encoded
 
 
-async def get_current_user(token: Annotated[str, Depends(OAuth2Bearer)], db: db_dependencies):
+class CurrentUser(BaseModel):
+    """Read-only snapshot of the authenticated user; load the User row to modify it."""
+    model_config = ConfigDict(frozen=True, from_attributes=True)
+
+    id: int
+    username: str
+    token_version: int
+    full_name: str | None = None
+    age: int | None = None
+    gender: str | None = None
+    university: str | None = None
+    major: str | None = None
+    bio: str | None = None
+    profile_completed: bool | None = None
+
+
+# Authenticated users by id. Short TTL: a token_version bump or profile edit made
+# on another worker shows up within USER_CACHE_TTL_SECONDS (on this one, at once).
+user_cache = TTLCache(maxsize=settings.USER_CACHE_SIZE, ttl=settings.USER_CACHE_TTL_SECONDS)
+
+
+def invalidate_cached_user(user_id: int):
+    """Call after changing a user row so the next request reloads it."""
+    user_cache.pop(user_id)
+
+
+async def revoke_user_tokens(db: AsyncSession, user_id: int):
+    """Invalidates every access token issued to the user so far."""
+    await db.execute(update(User).where(User.id == user_id).values(token_version=User.token_version + 1))
+    await db.commit()
+    invalidate_cached_user(user_id)
+
+
+def decode_access_token(token: str) -> tuple[int, int]:
+    """Returns (user_id, token_version) from a valid token, else raises 401."""
     credentials_exception = HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
                                           detail="Could not validate credentials", headers={"WWW-Authenticate": "Bearer"})
     try:
         token_decode = jwt.decode(
             token=token, key=SECRET_KEY, algorithms=ALGORITHM)
-        user_id = token_decode.get('id')
-        if user_id is None:
-            raise credentials_exception
-        result = await db.execute(select(User).where(User.id == user_id))
-        user = result.scalar_one_or_none()
-        if user is None:
-            raise credentials_exception
     except JWTError:
         raise credentials_exception
+    user_id = token_decode.get('id')
+    if user_id is None:
+        raise credentials_exception
+    return user_id, token_decode.get('ver', 0)
+
+
+async def authenticate_token(db: AsyncSession, token: str) -> CurrentUser:
+    """
+    Returns the token's user, from user_cache when possible. Raises 401 when the
+    user no longer exists or the token predates their current token_version.
+    """
+    user_id, token_version = decode_access_token(token)
+    user = user_cache.get(user_id)
+    if user is None:
+        result = await db.execute(select(User).where(User.id == user_id))
+        row = result.scalar_one_or_none()
+        if row is not None:
+            user = CurrentUser.model_validate(row)
+            user_cache.set(user_id, user)
+
+    if user is None or user.token_version != token_version:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
+                            detail="Could not validate credentials", headers={"WWW-Authenticate": "Bearer"})
     return user
 
 
+async def get_current_user(token: Annotated[str, Depends(OAuth2Bearer)], db: db_dependencies) -> CurrentUser:
+    return await authenticate_token(db, token)
+
+
+async def get_current_user_id(user: Annotated[CurrentUser, Depends(get_current_user)]) -> int:
+    """For handlers that only need the caller's id (same checks, same cache as get_current_user)."""
+    return user.id
+
+
 @router.post('/', status_code=status.HTTP_201_CREATED)
 async def create_user(db: db_dependencies, create_user_request: CreateUserRequest):
-    # Bcrypt max password length is 72 bytes - truncate at byte level, not character level
-    password_bytes = create_user_request.password.encode('utf-8')[:72]
-    password_truncated = password_bytes.decode('utf-8', errors='ignore')
     create_user_model = User(username=create_user_request.username,
                              email=create_user_request.email,
-                             hashed_password=bycrypt_context.hash(password_truncated))
+                             hashed_password=await hash_password(create_user_request.password))
     db.add(create_user_model)
     await db.commit()
     await db.refresh(create_user_model)
@@ -112,7 +177,7 @@ async def login(
     username_val = user.username if not isinstance(user.username, str) else user.username
     user_id_val = user.id if not isinstance(user.id, int) else user.id
     
-    access_token = await create_access_token(username_val, user_id_val)
+    access_token = await create_access_token(username_val, user_id_val, token_version=user.token_version)
     
     # Return extra fields so the frontend can store them
     return {
@@ -122,6 +187,37 @@ async def login(
         "username": username_val
     }
 
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(db: db_dependencies, user: Annotated[CurrentUser, Depends(get_current_user)]):
+    """
+    Signs the user out everywhere: every token issued so far stops working
+    (tokens carry one version per user, so one session cannot be revoked alone).
+    """
+    await revoke_user_tokens(db, user.id)
+
+
+@router.post("/password")
+async def change_password(
+    request: ChangePasswordRequest,
+    db: db_dependencies,
+    user: Annotated[CurrentUser, Depends(get_current_user)]
+):
+    """
+    Changes the password and revokes every existing token, so a leaked one dies
+    with the old password. Returns a fresh token for the caller's session.
+    """
+    row = await authenticate_user(db, user.username, request.current_password)
+    if not row:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect password")
+
+    row.hashed_password = await hash_password(request.new_password)
+    await revoke_user_tokens(db, row.id) # Commits the new hash too
+    await db.refresh(row)
+
+    access_token = await create_access_token(row.username, row.id, token_version=row.token_version)
+    return {"access_token": access_token, "token_type": "bearer"}
+
+
 @router.get("/user/{user_id}")
 async def get_public_profile(
     user_id: int, 
@@ -1,20 +1,22 @@
+import asyncio
+import functools
 import json
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, HTTPException
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, or_, and_
+from sqlalchemy import select, or_, and_, tuple_
 from typing import Annotated, List
 from pydantic import BaseModel      
 from datetime import datetime
 from sqlalchemy import func, case, desc
-from jose import jwt, JWTError
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from starlette import status
 
-from services.chat_manager import manager
-from core.database import get_db, AsyncLocalSession
-from services.chat_manager import manager
-from models.message import Message
+from services.chat_manager import ClientConnection, manager
+from services.message_sink import message_sink
+from core.database import AsyncLocalSession, get_db
+from models.message import Message, ConversationRead
 from models.user import User
-from routers.auth import get_current_user, SECRET_KEY, ALGORITHM
+from routers.auth import authenticate_token, get_current_user_id
 
 
 router = APIRouter(prefix="/chat", tags=["Chat"])
@@ -41,89 +43,146 @@ class ConversationSchema(BaseModel):
 @router.get("/conversations", response_model=List[ConversationSchema])
 async def get_conversations(
     db: Annotated[AsyncSession, Depends(get_db)],
-    current_user: Annotated[User, Depends(get_current_user)]
+    current_user_id: Annotated[int, Depends(get_current_user_id)]
 ):
     """
-    Get all recent conversations with their last message and online status.
+    Get all recent conversations with their last message, unread count and online status.
+    One round trip: a window over each (least, greatest) user pair picks the
+    last message and counts the partner's messages past my read cursor.
     """
-    # 1. Subquery to find the latest message ID for each conversation pair
-    # We group by the "other" person (partner)
-    
-    # Logic: Union of messages sent by me and messages sent to me
-    # This is a bit complex in pure ORM, so we'll use a window function strategy or distinct on
-    # For simplicity/speed in standard SQL:
-    
-    # Step 1: Find all unique partners I have exchanged messages with
-    sent_stmt = select(Message.receiver_id.label("partner_id")).where(Message.sender_id == current_user.id)
-    received_stmt = select(Message.sender_id.label("partner_id")).where(Message.receiver_id == current_user.id)
-    
-    partners_query = sent_stmt.union(received_stmt).subquery()
-    
-    # Step 2: Fetch User details for these partners
-    partners_result = await db.execute(
-        select(User).where(User.id.in_(select(partners_query)))
+    me = current_user_id
+    partner_id = case((Message.sender_id == me, Message.receiver_id), else_=Message.sender_id)
+    pair = (Message.user_low, Message.user_high)
+    is_unread = and_(Message.sender_id != me,
+                     Message.id > func.coalesce(ConversationRead.last_read_message_id, 0))
+
+    # 1. Every message I am part of, ranked newest-first inside its conversation
+    ranked = (
+        select(
+            partner_id.label("partner_id"),
+            Message.content,
+            Message.timestamp,
+            func.row_number().over(
+                partition_by=pair, order_by=(Message.timestamp.desc(), Message.id.desc())
+            ).label("position"),
+            func.count().filter(is_unread).over(partition_by=pair).label("unread_count"),
+        )
+        .outerjoin(ConversationRead, and_(ConversationRead.user_id == me,
+                                          ConversationRead.partner_id == partner_id))
+        .where(or_(Message.sender_id == me, Message.receiver_id == me))
+        .subquery()
     )
-    partners = partners_result.scalars().all()
-    
-    conversations = []
-    
-    for partner in partners:
-        # Step 3: Get the very last message for this specific pair
-        last_msg_query = select(Message).where(
-            or_(
-                and_(Message.sender_id == current_user.id, Message.receiver_id == partner.id),
-                and_(Message.sender_id == partner.id, Message.receiver_id == current_user.id)
-            )
-        ).order_by(desc(Message.timestamp)).limit(1)
-        
-        last_msg_result = await db.execute(last_msg_query)
-        last_msg = last_msg_result.scalars().first()
-        
-        # Step 4: Check Online Status from your ChatManager
-        # manager.active_connections is Dict[int, List[WebSocket]]
-        is_online = partner.id in manager.active_connections
-        
-        conversations.append(ConversationSchema(
-            partner_id=partner.id,
-            partner_name=partner.username, # Or partner.full_name
+
+    # 2. Keep the newest row per conversation, with the partner's name
+    result = await db.execute(
+        select(ranked, User.username)
+        .join(User, User.id == ranked.c.partner_id)
+        .where(ranked.c.position == 1)
+        .order_by(ranked.c.timestamp.desc())
+    )
+
+    return [
+        ConversationSchema(
+            partner_id=row.partner_id,
+            partner_name=row.username, # Or partner.full_name
             partner_image=None, # Assuming this field exists
-            last_message=last_msg.content if last_msg is not None else None,
-            last_message_time=last_msg.timestamp if last_msg is not None else None,
-            unread_count=0, # You can implement a read/unread flag logic later
-            is_online=is_online
-        ))
-    
-    # Sort by latest message time
-    conversations.sort(key=lambda x: x.last_message_time or datetime.min, reverse=True)
-    
-    return conversations
+            last_message=row.content,
+            last_message_time=row.timestamp,
+            unread_count=row.unread_count,
+            # 3. Online Status from the ChatManager
+            is_online=manager.is_online(row.partner_id)
+        )
+        for row in result.all()
+    ]
+
+
+@router.post("/read/{partner_id}")
+async def mark_conversation_read(
+    partner_id: int,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user_id: Annotated[int, Depends(get_current_user_id)],
+    message_id: int | None = None
+):
+    """
+    Advances my read cursor in the conversation with partner_id, to message_id
+    or (by default) to the latest message. The cursor never moves backwards.
+    """
+    # 1. The partner must exist and message_id belong to our conversation
+    if await db.scalar(select(User.id).where(User.id == partner_id)) is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    user_low, user_high = Message.conversation_key(current_user_id, partner_id)
+    in_conversation = (Message.user_low == user_low, Message.user_high == user_high)
+    if message_id is None:
+        result = await db.execute(select(func.max(Message.id)).where(*in_conversation))
+        message_id = result.scalar() or 0
+    elif await db.scalar(select(Message.id).where(Message.id == message_id, *in_conversation)) is None:
+        raise HTTPException(status_code=404, detail="Message not found in this conversation")
+
+    # 2. Upsert my read cursor
+
+    stmt = pg_insert(ConversationRead).values(
+        user_id=current_user_id, partner_id=partner_id, last_read_message_id=message_id)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ConversationRead.user_id, ConversationRead.partner_id],
+        set_={
+            "last_read_message_id": func.greatest(ConversationRead.last_read_message_id,
+                                                  stmt.excluded.last_read_message_id),
+            "updated_at": func.now(),
+        },
+    ).returning(ConversationRead.last_read_message_id)
+
+    result = await db.execute(stmt)
+    last_read = result.scalar_one()
+    await db.commit()
+    return {"partner_id": partner_id, "last_read_message_id": last_read}
+
 # --- REST ENDPOINT: GET HISTORY ---
 
 @router.get("/history/{partner_id}", response_model=List[MessageSchema])
 async def get_chat_history(
     partner_id: int,
     db: Annotated[AsyncSession, Depends(get_db)],
-    current_user: Annotated[User, Depends(get_current_user)]
+    current_user_id: Annotated[int, Depends(get_current_user_id)],
+    before: int | None = None,
+    limit: int = Query(50, ge=1, le=200)
 ):
     """
-    Fetch conversation history between Current User AND Partner.
+    Fetch conversation history between Current User AND Partner, oldest first.
+    Returns the latest `limit` messages; pass the id of the oldest message
+    received as `before` to page further back.
     """
-    # Logic: Select messages where (Sender=Me AND Receiver=You) OR (Sender=You AND Receiver=Me)
-    query = select(Message).where(
-        or_(
-            and_(Message.sender_id == current_user.id,
-                 Message.receiver_id == partner_id),
-            and_(Message.sender_id == partner_id,
-                 Message.receiver_id == current_user.id)
-        )
-    ).order_by(Message.timestamp.asc())
+    # Logic: keyset page on (timestamp, id) inside the conversation key
+    user_low, user_high = Message.conversation_key(current_user_id, partner_id)
+    query = select(Message).where(Message.user_low == user_low, Message.user_high == user_high)
+
+    if before is not None:
+        # Looked up inside this conversation: a foreign id yields NULL, hence an empty page
+        before_timestamp = select(Message.timestamp).where(
+            Message.id == before, Message.user_low == user_low, Message.user_high == user_high
+        ).scalar_subquery()
+        query = query.where(tuple_(Message.timestamp, Message.id) < tuple_(before_timestamp, before))
+
+    query = query.order_by(Message.timestamp.desc(), Message.id.desc()).limit(limit)
 
     result = await db.execute(query)
     messages = result.scalars().all()
-    return messages
+    return list(reversed(messages))
 
 # --- WEBSOCKET ENDPOINT: REAL-TIME ---
 
+def confirm_saved(connection: ClientConnection, saved: asyncio.Future, client_id):
+    """
+    Done-callback of a queued message: sends {"ack": client_id, "id", "timestamp"} (or an error)
+    through the connection's writer, like every other frame on that socket.
+    """
+    if not saved.cancelled() and saved.exception() is None:
+        message_id, timestamp = saved.result()
+        frame = {"ack": client_id, "id": message_id, "timestamp": timestamp.isoformat()}
+    else:
+        frame = {"error": "Message could not be saved", "client_id": client_id}
+    manager.send_to_connection(connection, json.dumps(frame))
+
 @router.websocket("/ws/{user_id}/{token}")
 async def websocket_endpoint(
     websocket: WebSocket,
@@ -133,23 +192,22 @@ async def websocket_endpoint(
     """
     Secured WebSocket Endpoint.
     """
-    # 1. VALIDATE TOKEN BEFORE ACCEPTING
+    # 1. VALIDATE TOKEN BEFORE ACCEPTING (revoked tokens and deleted users included)
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        token_user_id = payload.get("id")
-        
-        if token_user_id is None or token_user_id != user_id:
-            # Token is valid but belongs to a different user (Identity Theft attempt)
-            await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
-            return
-            
-    except JWTError:
-        # Token is invalid or expired
+        async with AsyncLocalSession() as db:
+            token_user = await authenticate_token(db, token)
+    except HTTPException:
+        # Token is invalid, expired or revoked
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    if token_user.id != user_id:
+        # Token is valid but belongs to a different user (Identity Theft attempt)
         await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
         return
 
     # 2. Accept connection if valid
-    await manager.connect(websocket, user_id)
+    connection = await manager.connect(websocket, user_id)
 
     try:
         while True:
@@ -160,26 +218,23 @@ async def websocket_endpoint(
                 receiver_id = int(message_data['to'])
                 content = message_data['msg']
             except (json.JSONDecodeError, KeyError, ValueError):
-                await websocket.send_json({"error": "Invalid message format"})
+                manager.send_to_connection(connection, json.dumps({"error": "Invalid message format"}))
                 continue
 
-            # 3. Persist to Database
-            try:
-                async with AsyncLocalSession() as db:
-                    new_msg = Message(sender_id=user_id,
-                                      receiver_id=receiver_id, content=content)
-                    db.add(new_msg)
-                    await db.commit()
-            except Exception as db_error:
-                print(f"Database error: {db_error}")
-                continue
+            # 3. Queue for persistence (batched write-behind, delivery does not wait on the DB)
+            saved = await message_sink.submit(user_id, receiver_id, content)
 
-            # 4. Route Message
+            # 4. Route Message. It reaches the recipient before it is persisted: if the write
+            # then fails, only the sender learns (error frame below) and history won't have it
             await manager.send_personal_message(
                 json.dumps({"sender": user_id, "msg": content}),
                 receiver_id
             )
 
+            # 5. Confirm durability to the sender once the batch has committed
+            saved.add_done_callback(
+                functools.partial(confirm_saved, connection, client_id=message_data.get('client_id')))
+
     except WebSocketDisconnect:
         manager.disconnect(websocket, user_id)
     except Exception as e:
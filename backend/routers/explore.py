@@ -0,0 +1,56 @@
+import asyncio
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from pydantic import BaseModel
+
+from core.database import AsyncLocalSession, get_db
+from routers.auth import get_current_user_id
+from routers.listings import ListingSchema
+from routers.matches import MatchProfileSchema, decode_match_cursor, encode_match_cursor
+from services.listing_service import get_recommendation_cards
+from services.matching import get_match_page, get_user_vector
+
+router = APIRouter(prefix="/explore", tags=["Explore"])
+
+# --- SCHEMA ---
+class ExploreFeedSchema(BaseModel):
+    matches: List[MatchProfileSchema]
+    next_match_cursor: Optional[str] = None # Pass as match_cursor (or to /matches/my-matches?cursor=) for more
+    listings: List[ListingSchema]
+
+
+@router.get("/feed", response_model=ExploreFeedSchema)
+async def get_explore_feed(
+    match_limit: int = Query(10, ge=1, le=100),
+    match_cursor: Optional[str] = None,
+    listing_limit: int = Query(10, ge=1, le=100),
+    listing_skip: int = Query(0, ge=0),
+    current_user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    The explore page in one round trip: the first page of roommate matches
+    and of listing recommendations, each with its own page size.
+    """
+    after = decode_match_cursor(match_cursor) if match_cursor else None
+
+    # 1. The user's vector, loaded once for both feeds
+    user_vector = await get_user_vector(db, current_user_id)
+    user_prefs = user_vector.responses if user_vector else {}
+
+    # 2. Both feeds at once. A session runs one query at a time, so listings get their own
+    async def listing_feed():
+        async with AsyncLocalSession() as listing_db:
+            return await get_recommendation_cards(listing_db, user_prefs, skip=listing_skip, limit=listing_limit)
+
+    (matches, next_after), listings = await asyncio.gather(
+        get_match_page(db, current_user_id, user_vector, match_limit, after),
+        listing_feed(),
+    )
+
+    return {
+        "matches": matches,
+        "next_match_cursor": encode_match_cursor(*next_after) if next_after is not None else None,
+        "listings": listings,
+    }
@@ -5,7 +5,7 @@ from typing import Annotated
 
 from core.database import get_db
 from models.user import User, UserVector
-from routers.auth import get_current_user
+from routers.auth import CurrentUser, get_current_user, invalidate_cached_user
 from schemas.onboarding import ProfileCreate
 
 router = APIRouter(prefix="/onboarding", tags=["Onboarding"])
@@ -14,25 +14,29 @@ router = APIRouter(prefix="/onboarding", tags=["Onboarding"])
 @router.post("/profile")
 async def update_profile(
     data: ProfileCreate,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[CurrentUser, Depends(get_current_user)],
     db: Annotated[AsyncSession, Depends(get_db)]
 ):
+    # current_user is a read-only snapshot: update this session's own row
+    user = await db.get(User, current_user.id)
+
     # Update fields
-    current_user.full_name = data.full_name
-    current_user.age = data.age
-    current_user.gender = data.gender
-    current_user.university = data.university
-    current_user.major = data.major
-    current_user.bio = data.bio
-    current_user.profile_completed = True # Mark Step 1 as done
+    user.full_name = data.full_name
+    user.age = data.age
+    user.gender = data.gender
+    user.university = data.university
+    user.major = data.major
+    user.bio = data.bio
+    user.profile_completed = True # Mark Step 1 as done
     
     await db.commit()
+    invalidate_cached_user(user.id)
     return {"message": "Profile updated successfully"}
 
 # --- 2. GET PROFILE ENDPOINT ---
 @router.get("/profile")
 async def get_profile(
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[CurrentUser, Depends(get_current_user)],
 ):
     """
     Returns the full profile details for the currently logged-in user.
@@ -50,7 +54,7 @@ async def get_profile(
 # --- 3. MASTER STATUS CHECK ---
 @router.get("/status")
 async def get_onboarding_status(
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[CurrentUser, Depends(get_current_user)],
     db: Annotated[AsyncSession, Depends(get_db)]
 ):
     """
@@ -1,3 +1,4 @@
+import numpy as np
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
@@ -5,18 +6,20 @@ from core.database import get_db
 from models.user import User, UserVector
 from schemas.test import TestSubmission
 from services.vector_logic import processing_submissions
-from routers.auth import get_current_user
+from services.match_index import match_index
+from services.top_matches import schedule_top_matches_update
+from routers.auth import get_current_user_id
 from typing import Annotated
 
 # Inititate user and database dependencies.
-user_dependencies = Annotated[User, Depends(get_current_user)] 
+user_id_dependencies = Annotated[int, Depends(get_current_user_id)]
 db_dependencies = Annotated[AsyncSession, Depends(get_db)]
 
 router = APIRouter(prefix="/test", tags=["Test"])
 
 @router.get("/status")
 async def check_test_status(
-    user: user_dependencies,
+    user_id: user_id_dependencies,
     db: db_dependencies
 ):
     """
@@ -25,7 +28,7 @@ async def check_test_status(
     - If False -> Show 'Start Assessment' 
     """
     # Query the vector table for this user
-    result = await db.execute(select(UserVector).where(UserVector.user_id == user.id))
+    result = await db.execute(select(UserVector).where(UserVector.user_id == user_id))
     vector_entry = result.scalar_one_or_none()
 
     if vector_entry is not None and vector_entry.is_completed is True:
@@ -36,14 +39,14 @@ async def check_test_status(
 @router.post("/submit")
 async def submit_assessment(
     submission: TestSubmission,
-    user: user_dependencies,
+    user_id: user_id_dependencies,
     db: db_dependencies
 ):
     """
     Receives user answers, converts to Vector, and saves to DB.
     """
     # 1. Check if already done (Double enforcement) 
-    result = await db.execute(select(UserVector).where(UserVector.user_id == user.id))
+    result = await db.execute(select(UserVector).where(UserVector.user_id == user_id))
     user_vector = result.scalar_one_or_none()
 
     if user_vector is not None and user_vector.is_completed is True:
@@ -60,17 +63,28 @@ async def submit_assessment(
     # 3. Create or Update the Record
     if not user_vector:
         # If row doesn't exist yet, create it
-        user_vector = UserVector(user_id=user.id)
+        user_vector = UserVector(user_id=user_id)
         db.add(user_vector)
         await db.flush()
 
     # Update columns
     setattr(user_vector, 'responses', raw_data)
+    setattr(user_vector, 'district', raw_data['district'])
+    setattr(user_vector, 'budget', raw_data['budget'])
     setattr(user_vector, 'vector_data_embeddings', math_vector)
+    setattr(user_vector, 'embedding_norm', float(np.linalg.norm(math_vector)))
     setattr(user_vector, 'is_completed', True) 
 
     # 4. Commit to Database
     await db.commit()
     await db.refresh(user_vector)
 
+    # 5. Make the new vector matchable without reloading the index
+    await match_index.ensure_loaded(db)
+    match_index.upsert(user_id, math_vector)
+
+    # 6. Update the precomputed match lists this vector changes. In the background:
+    # the vector is saved either way, and a failure there is retried (services/top_matches.py)
+    schedule_top_matches_update(user_id, math_vector)
+
     return {"message": "Assessment saved successfully", "vector_generated": math_vector}
\ No newline at end of file
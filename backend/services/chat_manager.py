@@ -1,30 +1,396 @@
-from typing import Dict, List
+import asyncio
+import json
+from abc import ABC, abstractmethod
+import time
+import uuid
+import asyncpg
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
 from fastapi import WebSocket
+from starlette import status
+
+from core.config import settings
+
+EventHandler = Callable[[dict], Awaitable[None]]
+
+
+# --- 1. BROKERS: carry chat events between worker processes ---
+class ChatBroker(ABC):
+    """
+    Publishes chat events to every worker, the publisher included.
+    Events are small JSON-serializable dicts; see ConnectionManager._handle_event.
+    """
+
+    async def start(self, handler: EventHandler):
+        self._handler = handler
+
+    async def stop(self):
+        pass
+
+    @property
+    def healthy(self) -> bool:
+        return True
+
+    async def restart(self):
+        """Re-opens whatever connection the broker holds (see ConnectionManager._heartbeat_loop)."""
+        await self.stop()
+        await self.start(self._handler)
+
+    @abstractmethod
+    async def publish(self, event: dict):
+        ...
+
+
+class InProcessBroker(ChatBroker):
+    """Single-process deployments: events never leave this worker."""
+
+    async def publish(self, event: dict):
+        await self._handler(event)
+
+
+class PostgresBroker(ChatBroker):
+    """
+    Fans events out with LISTEN/NOTIFY on the app's own Postgres, using two
+    raw asyncpg connections (one listening, one publishing): taken from the
+    SQLAlchemy engine, or opened on CHAT_BROKER_DSN when the engine goes
+    through PgBouncer. NOTIFY payloads are capped at 8000 bytes, so larger
+    events are split into chunks and reassembled on the receiving side.
+    """
+
+    CHANNEL = "fitnest_chat"
+    MAX_PAYLOAD = 7000 # bytes, below Postgres' 8000 limit
+    CHUNK_CHARS = 3000 # re-encoding a chunk can at most double it
+    # Chunks of one event arrive back to back: a buffer still incomplete after this lost a chunk
+    # (e.g. the publisher died mid-event) and is dropped, as are the oldest past MAX_PARTIAL_EVENTS
+    CHUNK_TTL_SECONDS = 30
+    MAX_PARTIAL_EVENTS = 100
 
-class ConnectionManager:
     def __init__(self):
-        # Maps user_id -> List of active WebSockets (User might have 2 tabs open)
-        self.active_connections: Dict[int, List[WebSocket]] = {}
+        self._listen_conn = None
+        self._publish_conn = None
+        self._listener = None
+        self._publish_lock = asyncio.Lock()
+        # chunk id -> (first seen, parts by index), oldest first
+        self._partial: Dict[str, Tuple[float, Dict[int, str]]] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self.expired_events = 0
+
+    async def start(self, handler: EventHandler):
+        await super().start(handler)
+        self._listen_conn, listener = await self._open()
+        self._publish_conn, self._publisher = await self._open()
+        await listener.add_listener(self.CHANNEL, self._on_notify)
+        self._listener = listener
+
+    async def stop(self):
+        for conn in (self._listen_conn, self._publish_conn):
+            if conn is not None:
+                # Discard rather than return to the pool: the socket carries LISTEN state
+                try:
+                    await (conn.close() if isinstance(conn, asyncpg.Connection) else conn.invalidate())
+                except Exception:
+                    pass
+        self._listen_conn = self._publish_conn = self._listener = None
+
+    @property
+    def healthy(self) -> bool:
+        return self._listener is not None and not self._listener.is_closed()
+
+    async def _open(self):
+        """
+        A connection for the broker's lifetime: its own on CHAT_BROKER_DSN,
+        else checked out of the engine's pool. Returns (handle to close, asyncpg connection).
+        """
+        if settings.CHAT_BROKER_DSN:
+            conn = await asyncpg.connect(settings.CHAT_BROKER_DSN.replace("+asyncpg", "", 1))
+            return conn, conn
+        from core.database import engine
+        conn = await engine.connect()
+        raw = await conn.get_raw_connection()
+        return conn, raw.driver_connection
+
+    async def publish(self, event: dict):
+        payload = json.dumps(event)
+        if len(payload) <= self.MAX_PAYLOAD:
+            await self._notify(payload)
+            return
+        chunk_id = uuid.uuid4().hex
+        parts = [payload[i:i + self.CHUNK_CHARS] for i in range(0, len(payload), self.CHUNK_CHARS)]
+        for index, part in enumerate(parts):
+            await self._notify(json.dumps({"chunk": chunk_id, "index": index, "count": len(parts), "data": part}))
+
+    async def _notify(self, payload: str):
+        async with self._publish_lock:
+            await self._publisher.execute("SELECT pg_notify($1, $2)", self.CHANNEL, payload)
+
+    def _on_notify(self, connection, pid, channel, payload: str):
+        event = json.loads(payload)
+        if "chunk" in event:
+            self._expire_partial()
+            if event["chunk"] not in self._partial:
+                self._partial[event["chunk"]] = (time.monotonic(), {})
+            parts = self._partial[event["chunk"]][1]
+            parts[event["index"]] = event["data"]
+            if len(parts) < event["count"]:
+                return
+            del self._partial[event["chunk"]]
+            event = json.loads("".join(parts[i] for i in range(event["count"])))
+        task = asyncio.create_task(self._handler(event))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+
+    def _expire_partial(self):
+        """Drops chunk buffers past CHUNK_TTL_SECONDS, and the oldest past MAX_PARTIAL_EVENTS."""
+        cutoff = time.monotonic() - self.CHUNK_TTL_SECONDS
+        while self._partial:
+            chunk_id, (first_seen, _) = next(iter(self._partial.items()))
+            if first_seen >= cutoff and len(self._partial) < self.MAX_PARTIAL_EVENTS:
+                break
+            del self._partial[chunk_id]
+            self.expired_events += 1
+            print(f"⚠️ Chat broker dropped incomplete event {chunk_id}")
+
+
+def create_broker() -> ChatBroker:
+    if settings.CHAT_BROKER == "postgres":
+        return PostgresBroker()
+    return InProcessBroker()
+
 
-    async def connect(self, websocket: WebSocket, user_id: int):
-        """Accepts the connection and stores it."""
+# --- 2. LOCAL SOCKETS ---
+class ClientConnection:
+    """One open socket with its own bounded outbound queue and writer task."""
+
+    def __init__(self, manager: "ConnectionManager", websocket: WebSocket, user_id: int):
+        self.manager = manager
+        self.websocket = websocket
+        self.user_id = user_id
+        self.queue: asyncio.Queue[str] = asyncio.Queue(maxsize=settings.CHAT_OUTBOUND_QUEUE_SIZE)
+        self.writer = asyncio.create_task(self._write_loop())
+
+    def offer(self, message: str) -> bool:
+        """Queues a message without waiting. False means this consumer is too slow."""
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    async def _write_loop(self):
+        try:
+            while True:
+                message = await self.queue.get()
+                await asyncio.wait_for(self.websocket.send_text(message),
+                                       timeout=settings.CHAT_SEND_TIMEOUT_SECONDS)
+                self.manager.messages_sent += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Dead or stuck socket: forget it so it stops receiving fan-out, and close it
+            # so the client notices and reconnects instead of sending into the void
+            self.manager.send_errors += 1
+            self.manager.remove(self)
+            try:
+                await asyncio.wait_for(self.websocket.close(code=status.WS_1011_INTERNAL_ERROR),
+                                       timeout=settings.CHAT_SEND_TIMEOUT_SECONDS)
+            except Exception:
+                pass
+
+
+# --- 3. THE MANAGER ---
+class ConnectionManager:
+    """
+    Owns this worker's sockets and uses the broker to reach users connected
+    to other workers. Presence is shared the same way: every worker announces
+    its users going online/offline and heartbeats, so is_online() is
+    correct across processes.
+    """
+
+    def __init__(self, broker: Optional[ChatBroker] = None):
+        # Maps user_id -> List of active connections (User might have 2 tabs open)
+        self.active_connections: Dict[int, List[ClientConnection]] = {}
+
+        self.worker_id = uuid.uuid4().hex[:12]
+        self.broker = broker or InProcessBroker()
+        # user_id -> ids of OTHER workers holding a socket for that user
+        self.remote_presence: Dict[int, Set[str]] = {}
+        self.worker_last_seen: Dict[str, float] = {}
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+        # Counters for stats()
+        self.messages_sent = 0
+        self.dropped_messages = 0
+        self.dropped_connections = 0
+        self.send_errors = 0
+
+    # --- Lifecycle (wired into main.py's lifespan) ---
+    async def start(self):
+        """
+        Connects the broker. The heartbeat loop starts first, so if this raises
+        (database down at boot) the broker keeps being retried in the background.
+        """
+        self._heartbeat = asyncio.create_task(self._heartbeat_loop())
+        await self.broker.start(self._handle_event)
+        await self.broker.publish({"type": "hello", "worker": self.worker_id})
+
+    async def stop(self):
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+        try:
+            await self.broker.publish({"type": "bye", "worker": self.worker_id})
+        except Exception as e:
+            print(f"Chat broker error: {e}")
+        await self.broker.stop()
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(settings.CHAT_PRESENCE_HEARTBEAT_SECONDS)
+            try:
+                if not self.broker.healthy:
+                    await self.broker.restart()
+                    # Ask the other workers for their users and tell them about ours
+                    await self.broker.publish({"type": "hello", "worker": self.worker_id})
+                    await self._announce_presence()
+                await self.broker.publish({"type": "heartbeat", "worker": self.worker_id})
+            except Exception as e:
+                print(f"Chat broker error: {e}")
+
+    # --- Local sockets ---
+    async def connect(self, websocket: WebSocket, user_id: int) -> ClientConnection:
+        """Accepts the connection and stores it. Write to it only through send_to_connection()."""
         await websocket.accept()
         if user_id not in self.active_connections:
             self.active_connections[user_id] = []
-        self.active_connections[user_id].append(websocket)
+            self._publish_soon({"type": "presence", "worker": self.worker_id, "user_id": user_id, "online": True})
+        connection = ClientConnection(self, websocket, user_id)
+        self.active_connections[user_id].append(connection)
+        return connection
 
     def disconnect(self, websocket: WebSocket, user_id: int):
         """Removes the connection when user closes tab."""
+        for connection in list(self.active_connections.get(user_id, [])):
+            if connection.websocket is websocket:
+                self.remove(connection)
+
+    def remove(self, connection: ClientConnection):
+        """Forgets a connection and stops its writer. Safe to call more than once."""
+        connections = self.active_connections.get(connection.user_id)
+        if connections is not None and connection in connections:
+            connections.remove(connection)
+            if not connections:
+                del self.active_connections[connection.user_id]
+                self._publish_soon({"type": "presence", "worker": self.worker_id,
+                                    "user_id": connection.user_id, "online": False})
+        if connection.writer is not asyncio.current_task():
+            connection.writer.cancel()
+
+    def is_online(self, user_id: int) -> bool:
+        """True if the user has a socket on this or any live worker."""
         if user_id in self.active_connections:
-            if websocket in self.active_connections[user_id]:
-                self.active_connections[user_id].remove(websocket)
-            if not self.active_connections[user_id]:
-                del self.active_connections[user_id]
+            return True
+        return bool(self._live_workers(self.remote_presence.get(user_id, ())))
+
+    def _live_workers(self, workers) -> Set[str]:
+        cutoff = time.monotonic() - 3 * settings.CHAT_PRESENCE_HEARTBEAT_SECONDS
+        return {w for w in workers if self.worker_last_seen.get(w, 0) >= cutoff}
 
+    # --- Delivery ---
     async def send_personal_message(self, message: str, user_id: int):
-        """Sends a message ONLY to the specific user."""
-        if user_id in self.active_connections:
-            for connection in self.active_connections[user_id]:
-                await connection.send_text(message)
+        """
+        Sends a message ONLY to the specific user, wherever their sockets live.
+        Each socket has its own writer, so one slow tab never delays the others;
+        a socket whose queue is full is disconnected instead of buffering forever.
+        """
+        self._deliver_local(message, user_id)
+        # Only touch the broker when another worker holds a socket for this user
+        if self._live_workers(self.remote_presence.get(user_id, ())):
+            await self.broker.publish({"type": "message", "worker": self.worker_id,
+                                       "user_id": user_id, "data": message})
+
+    def _deliver_local(self, message: str, user_id: int):
+        for connection in list(self.active_connections.get(user_id, [])):
+            self.send_to_connection(connection, message)
+
+    def send_to_connection(self, connection: ClientConnection, message: str):
+        """Queues a message for one socket, through its writer; a full queue drops the connection."""
+        if not connection.offer(message):
+            self.dropped_messages += 1
+            self.dropped_connections += 1
+            self.remove(connection)
+            self._spawn(self._close_slow_consumer(connection))
+
+    async def _close_slow_consumer(self, connection: ClientConnection):
+        try:
+            await connection.websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+        except Exception:
+            pass
+
+    # --- Broker events ---
+    async def _handle_event(self, event: dict):
+        worker = event.get("worker")
+        if worker == self.worker_id:
+            return
+        self.worker_last_seen[worker] = time.monotonic()
+        kind = event.get("type")
+
+        if kind == "message":
+            self._deliver_local(event["data"], event["user_id"])
+        elif kind == "presence":
+            self._set_remote_presence(worker, event["user_id"], event["online"])
+        elif kind == "presence_sync":
+            for user_id in event["users"]:
+                self._set_remote_presence(worker, user_id, True)
+        elif kind == "hello":
+            # A worker just started: tell it who is connected here
+            await self._announce_presence()
+        elif kind == "bye":
+            self.worker_last_seen.pop(worker, None)
+            for user_id in list(self.remote_presence):
+                self._set_remote_presence(worker, user_id, False)
+
+    def _set_remote_presence(self, worker: str, user_id: int, online: bool):
+        workers = self.remote_presence.setdefault(user_id, set())
+        if online:
+            workers.add(worker)
+        else:
+            workers.discard(worker)
+        if not workers:
+            del self.remote_presence[user_id]
+
+    async def _announce_presence(self):
+        await self.broker.publish({"type": "presence_sync", "worker": self.worker_id,
+                                   "users": list(self.active_connections)})
+
+    def _publish_soon(self, event: dict):
+        """Publishes from synchronous code paths (connect/disconnect bookkeeping)."""
+        async def publish():
+            try:
+                await self.broker.publish(event)
+            except Exception as e:
+                print(f"Chat broker error: {e}")
+        self._spawn(publish())
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def stats(self) -> Dict[str, int]:
+        """Connection, queue-depth and drop counters for monitoring."""
+        depths = [c.queue.qsize() for conns in self.active_connections.values() for c in conns]
+        return {
+            "users_online": len(self.active_connections),
+            "connections": len(depths),
+            "queued_messages": sum(depths),
+            "max_queue_depth": max(depths, default=0),
+            "messages_sent": self.messages_sent,
+            "dropped_messages": self.dropped_messages,
+            "dropped_connections": self.dropped_connections,
+            "send_errors": self.send_errors,
+            "remote_users_online": len(self.remote_presence),
+            "broker_expired_events": getattr(self.broker, "expired_events", 0),
+        }
 
-manager = ConnectionManager()
\ No newline at end of file
+manager = ConnectionManager(create_broker())
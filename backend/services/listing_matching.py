@@ -1,5 +1,9 @@
-from typing import Dict
-from models.listing import Listing
+from typing import Dict, Iterable, TYPE_CHECKING
+import numpy as np
+from sqlalchemy import Integer, Float, cast, func, literal
+
+if TYPE_CHECKING:
+    from models.listing import Listing
 
 # --- 1. REUSE THE MAPS FROM VECTOR_LOGIC ---
 DISTRICT_MAP = {
@@ -12,6 +16,10 @@ DISTRICT_MAP = {
     "Thu Duc": 0.8,
 }
 
+def listing_location_value(district: str) -> float:
+    """Maps a listing's district to the 0-1 location scale (unknown districts sit mid-way)."""
+    return DISTRICT_MAP.get(district, 0.5)
+
 # --- 2. DEFINE PRICE BUCKETS (To match user's "Budget" choice) ---
 def normalize_listing_price(price: int) -> float:
     """Maps a raw price (VND) to the 0-1 scale used in the questionnaire."""
@@ -28,7 +36,7 @@ def normalize_user_budget(budget_answer: str) -> float:
     return 1.0
 
 # --- 3. THE ALGORITHM ---
-def calculate_listing_score(user_prefs: Dict, listing: Listing) -> int:
+def calculate_listing_score(user_prefs: Dict, listing: "Listing") -> int:
     """
     Calculates a 0-100 Match Score based purely on Location & Price.
     """
@@ -40,7 +48,7 @@ def calculate_listing_score(user_prefs: Dict, listing: Listing) -> int:
     
     # Get vector positions
     user_loc_val = DISTRICT_MAP.get(user_district, 0.0)
-    list_loc_val = DISTRICT_MAP.get(listing_district, 0.5)
+    list_loc_val = listing_location_value(listing_district)
     
     # Calculate closeness (1.0 is far, 0.0 is same)
     loc_distance = abs(user_loc_val - list_loc_val)
@@ -60,4 +68,68 @@ def calculate_listing_score(user_prefs: Dict, listing: Listing) -> int:
     # You can adjust weights here (e.g., Price might be more important)
     final_score = (loc_score * 0.5) + (price_score * 0.5)
     
-    return int(final_score)
\ No newline at end of file
+    return int(final_score)
+
+# --- 4. THE SAME ALGORITHM, VECTORIZED ---
+# District codes index into _DISTRICT_VALUES; the last slot is "unknown district"
+DISTRICT_CODES = {name: code for code, name in enumerate(DISTRICT_MAP)}
+UNKNOWN_DISTRICT_CODE = len(DISTRICT_CODES)
+_DISTRICT_VALUES = np.array(list(DISTRICT_MAP.values()) + [0.5])
+
+# Bucket edges of normalize_listing_price (a price equal to an edge falls in the upper bucket)
+_PRICE_EDGES = np.array([1500000, 2000000, 3000000])
+_PRICE_BUCKETS = np.array([0.0, 0.33, 0.66, 1.0])
+
+
+def encode_districts(districts: Iterable[str]) -> np.ndarray:
+    """Turns district names into the integer codes used by calculate_listing_scores."""
+    return np.fromiter((DISTRICT_CODES.get(d, UNKNOWN_DISTRICT_CODE) for d in districts), dtype=np.int64)
+
+
+def calculate_listing_scores(user_prefs: Dict, district_codes: np.ndarray, prices: np.ndarray) -> np.ndarray:
+    """
+    Batch version of calculate_listing_score over columnar listing data.
+    Returns the same integer scores, one per listing, in a single pass.
+    """
+    if not user_prefs:
+        return np.full(len(prices), 50, dtype=np.int64)
+
+    user_loc_val = DISTRICT_MAP.get(user_prefs.get('district', 'District 1'), 0.0)
+    user_price_val = normalize_user_budget(user_prefs.get('budget', 'Under 1.5mil VND'))
+
+    list_loc_vals = _DISTRICT_VALUES[district_codes]
+    list_price_vals = _PRICE_BUCKETS[np.searchsorted(_PRICE_EDGES, prices, side='right')]
+
+    loc_score = np.maximum(0, 1.0 - np.abs(user_loc_val - list_loc_vals)) * 100
+    price_score = np.maximum(0, 1.0 - np.abs(user_price_val - list_price_vals)) * 100
+
+    final_score = (loc_score * 0.5) + (price_score * 0.5)
+    return final_score.astype(np.int64)
+
+
+# --- 5. THE SAME ALGORITHM AS A SQL EXPRESSION ---
+def listing_score_expression(user_prefs: Dict):
+    """
+    SQL twin of calculate_listing_score over the pre-computed
+    Listing.location_value / Listing.price_bucket columns, so Postgres can
+    ORDER BY the score and LIMIT to one page.
+    Operations are in the same order and in double precision, so the scores are identical.
+    """
+    from models.listing import Listing
+
+    if not user_prefs:
+        return literal(50, Integer)
+
+    user_loc_val = DISTRICT_MAP.get(user_prefs.get('district', 'District 1'), 0.0)
+    user_price_val = normalize_user_budget(user_prefs.get('budget', 'Under 1.5mil VND'))
+
+    def closeness(user_val: float, column):
+        distance = func.abs(literal(user_val, Float) - column)
+        return func.greatest(literal(0.0, Float), literal(1.0, Float) - distance) * literal(100.0, Float)
+
+    loc_score = closeness(user_loc_val, Listing.location_value)
+    price_score = closeness(user_price_val, Listing.price_bucket)
+    final_score = loc_score * literal(0.5, Float) + price_score * literal(0.5, Float)
+
+    # Scores are never negative, so floor() matches Python's int() truncation
+    return cast(func.floor(final_score), Integer)
@@ -1,7 +1,31 @@
+import json
+import time
+import numpy as np
+from typing import Dict, List
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete
-from models.listing import Listing
+from sqlalchemy import JSON, Text, cast, func, literal, select, delete, tuple_
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, insert as pg_insert
+from sqlalchemy.orm import selectinload
+from core.cache import TTLCache
+from core.config import settings
+from models.listing import Listing, ListingsVersion
 from schemas.listing import ListingCreate
+from services.listing_matching import (
+    calculate_listing_scores, encode_districts, listing_location_value, listing_score_expression,
+    normalize_listing_price
+)
+
+# Ranked (listing_id, score) pages keyed by answer pair + listings_version. The version
+# lives in the database and is re-read every LISTINGS_VERSION_POLL_SECONDS, so changes
+# committed by any process (other workers, import_listings.py) invalidate the pages
+recommendation_cache = TTLCache(maxsize=settings.RECOMMENDATION_CACHE_SIZE,
+                                ttl=settings.RECOMMENDATION_CACHE_TTL_SECONDS)
+listings_version = 0
+_version_read_at = float("-inf")
+
+# Columns a feed row may set; re-imports overwrite them
+IMPORT_COLUMNS = ("owner_id", "title", "price", "size", "district", "images", "features", "description",
+                  "location_value", "price_bucket")
 
 
 async def create_listing(db: AsyncSession, listing_data: ListingCreate, owner_id: int) -> Listing:
@@ -13,11 +37,64 @@ async def create_listing(db: AsyncSession, listing_data: ListingCreate, owner_id
         owner_id=owner_id
     )
     db.add(new_listing)
+    await bump_listings_version(db)
     await db.commit()
+    expire_listings_version()
     await db.refresh(new_listing)
     return new_listing
 
 
+async def bulk_upsert_listings(db: AsyncSession, rows: List[Dict]) -> int:
+    """
+    Inserts or updates many listings in one statement, keyed by (source, external_id).
+    Does not commit, so the caller decides the transaction size (listings_version is
+    bumped in it too). Returns the rows sent.
+    """
+    # 1. Last occurrence wins: ON CONFLICT cannot touch the same row twice in one statement
+    unique = {}
+    for row in rows:
+        row = dict(row)
+        # Core inserts skip the ORM before_insert hook, so fill the scoring columns here
+        row["location_value"] = listing_location_value(row["district"])
+        row["price_bucket"] = normalize_listing_price(row["price"])
+        unique[(row["source"], row["external_id"])] = row
+    if not unique:
+        return 0
+
+    # 2. One array per column through unnest(): a single cached statement whatever the chunk size
+    rows = list(unique.values())
+    columns = ("source", "external_id") + IMPORT_COLUMNS
+    table = Listing.__table__
+    arrays = []
+    for name in columns:
+        values = [row.get(name) for row in rows]
+        element_type = table.c[name].type
+        if isinstance(element_type, JSON):
+            # asyncpg has no json[] codec: ship text and cast back
+            values, element_type = [json.dumps(value if value is not None else []) for value in values], Text()
+        arrays.append(literal(values, ARRAY(element_type)))
+    feed = func.unnest(*arrays).table_valued(*columns).render_derived(name="feed")
+    feed_columns = [cast(feed.c[name], JSON) if isinstance(table.c[name].type, JSON) else feed.c[name]
+                    for name in columns]
+
+    # 3. Upsert, skipping rows whose content is unchanged so re-runs don't churn the table
+    stmt = pg_insert(Listing).from_select(list(columns), select(*feed_columns))
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_listings_source_external_id",
+        set_={column: stmt.excluded[column] for column in IMPORT_COLUMNS},
+        where=tuple_(*_comparable(table.c)).is_distinct_from(tuple_(*_comparable(stmt.excluded)))
+    )
+    await db.execute(stmt)
+    await bump_listings_version(db)
+    return len(unique)
+
+
+def _comparable(columns) -> list:
+    # json has no equality operator in Postgres; jsonb does
+    return [cast(columns[name], JSONB) if isinstance(columns[name].type, JSON) else columns[name]
+            for name in IMPORT_COLUMNS]
+
+
 async def get_all_listings(db: AsyncSession, skip: int = 0, limit: int = 20) -> list[Listing]:
     """
     Fetches all listings with pagination.
@@ -55,5 +132,133 @@ async def delete_listing(db: AsyncSession, listing_id: int, owner_id: int) -> bo
     delete_query = delete(Listing).where(
         Listing.id == listing_id, Listing.owner_id == owner_id)
     await db.execute(delete_query)
+    await bump_listings_version(db)
     await db.commit()
+    expire_listings_version()
     return True
+
+
+async def bump_listings_version(db: AsyncSession):
+    """
+    Call in the transaction that changes listings. The new version commits with
+    the change, so no process can cache pre-commit rows under it.
+    """
+    stmt = pg_insert(ListingsVersion).values(id=1, version=1)
+    stmt = stmt.on_conflict_do_update(index_elements=[ListingsVersion.id],
+                                      set_={"version": ListingsVersion.version + 1})
+    await db.execute(stmt)
+
+
+def expire_listings_version():
+    """After committing a listing change: this worker re-reads the version on its next request."""
+    global _version_read_at
+    _version_read_at = float("-inf")
+
+
+async def current_listings_version(db: AsyncSession) -> int:
+    """The committed listings_version, read at most every LISTINGS_VERSION_POLL_SECONDS."""
+    global listings_version, _version_read_at
+    if time.monotonic() - _version_read_at >= settings.LISTINGS_VERSION_POLL_SECONDS:
+        listings_version = (await db.scalar(select(ListingsVersion.version))) or 0
+        _version_read_at = time.monotonic()
+    return listings_version
+
+
+async def get_recommendation_cards(
+    db: AsyncSession, user_prefs: Dict, skip: int = 0, limit: int = 20
+) -> list[Dict]:
+    """One page of recommendations shaped for the listing cards (routers/listings.ListingSchema)."""
+    ranked = await get_recommended_listings(db, user_prefs, skip=skip, limit=limit)
+
+    scored_listings = []
+
+    for item, score in ranked:
+        # Owner Info (already loaded)
+        owner = item.owner
+        owner_name = owner.full_name if owner else "Unknown"
+        owner_img = "https://t4.ftcdn.net/jpg/00/64/67/27/360_F_64672736_U5kpdGs9keUll8CRQ3p3YaEv2M6qkVY5.jpg" # Default
+
+        scored_listings.append({
+            "id": item.id,
+            "title": item.title,
+            "price": item.price,
+            "size": item.size,
+            "location": item.district,
+            "images": item.images,
+            "fitScore": score, # <--- The AI Score
+            "host": {
+                "name": owner_name,
+                "image": owner_img,
+                "compatibility": score # Host compatibility usually correlates with listing fit
+            },
+            "features": item.features,
+            "description": item.description
+        })
+
+    return scored_listings
+
+
+def _recommendation_key(user_prefs: Dict, skip: int, limit: int, version: int) -> tuple:
+    # The ranking only depends on these two answers (see calculate_listing_score)
+    if not user_prefs:
+        return (None, None, skip, limit, version)
+    return (user_prefs.get('district'), user_prefs.get('budget'), skip, limit, version)
+
+
+async def get_recommended_listings(
+    db: AsyncSession, user_prefs: Dict, skip: int = 0, limit: int = 20
+) -> list[tuple[Listing, int]]:
+    """
+    Returns one page of (listing, fit score), best first (ties by id), with owners loaded.
+    Rankings are cached per (district, budget) answer pair until the listing set changes.
+    """
+    key = _recommendation_key(user_prefs, skip, limit, await current_listings_version(db))
+    ranked = recommendation_cache.get(key)
+    if ranked is None:
+        if settings.LISTING_SCORING_BACKEND == "numpy":
+            ranked = await _rank_listings_numpy(db, user_prefs, skip, limit)
+        else:
+            ranked = await _rank_listings_sql(db, user_prefs, skip, limit)
+        recommendation_cache.set(key, ranked)
+
+    if not ranked:
+        return []
+    result = await db.execute(
+        select(Listing).options(selectinload(Listing.owner)).where(Listing.id.in_([i for i, _ in ranked])))
+    listings = {listing.id: listing for listing in result.scalars().all()}
+    return [(listings[i], score) for i, score in ranked if i in listings]
+
+
+async def _rank_listings_sql(
+    db: AsyncSession, user_prefs: Dict, skip: int, limit: int
+) -> list[tuple[int, int]]:
+    """Postgres scores, sorts and pages; only the page's ids travel to the app."""
+    score = listing_score_expression(user_prefs).label("fit_score")
+    result = await db.execute(
+        select(Listing.id, score)
+        .order_by(score.desc(), Listing.id)
+        .offset(skip)
+        .limit(limit)
+    )
+    return [(row.id, row.fit_score) for row in result.all()]
+
+
+async def _rank_listings_numpy(
+    db: AsyncSession, user_prefs: Dict, skip: int, limit: int
+) -> list[tuple[int, int]]:
+    """Scores narrow columns in one NumPy pass and pages the result."""
+    result = await db.execute(select(Listing.id, Listing.district, Listing.price))
+    rows = result.all()
+    if not rows or skip >= len(rows):
+        return []
+
+    ids = np.fromiter((row.id for row in rows), dtype=np.int64, count=len(rows))
+    prices = np.fromiter((row.price for row in rows), dtype=np.int64, count=len(rows))
+    scores = calculate_listing_scores(user_prefs, encode_districts(row.district for row in rows), prices)
+
+    # Same order as the SQL path: score desc, then id asc
+    keys = (100 - scores) * (int(ids.max()) + 1) + ids
+    end = min(skip + limit, len(keys))
+    top = np.argpartition(keys, end - 1)[:end] if end < len(keys) else np.arange(len(keys))
+    top = top[np.argsort(keys[top])][skip:end]
+    return list(zip(ids[top].tolist(), scores[top].tolist()))
@@ -0,0 +1,458 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import LargeBinary, select, type_coerce
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import settings
+from models.types import unpack_vectors
+from models.user import UserVector
+
+VECTOR_DIM = 7  # One slot per questionnaire answer (see vector_logic.processing_submissions)
+
+# float32 error on a percentage is ~1e-5; anything closer than this to an integer gets an exact re-score
+_BOUNDARY_TOLERANCE = 1e-3
+
+
+def calculate_match_scores(similarities: np.ndarray) -> np.ndarray:
+    """Vectorized matching.calculate_match_score for a whole array of similarities."""
+    return (np.clip(similarities, 0, None) * 100).astype(np.int64)
+
+
+class IVFPartition:
+    """
+    Inverted-file coarse partition for approximate search.
+
+    Rows are clustered around `nlist` spherical k-means centroids; a query
+    only scans the rows of the `nprobe` partitions whose centroids are closest
+    to it. The candidates are still scored exactly, so ANN can miss a match
+    but never misreports a score.
+
+    Posting lists are rebuilt lazily: rows added or moved since the last
+    rebuild sit in a small "dirty" set that every query scans as well.
+    """
+
+    TRAIN_ITERATIONS = 10
+    TRAIN_SAMPLE_PER_LIST = 64
+    ASSIGN_CHUNK = 16384 # rows per (chunk x nlist) similarity block
+
+    def __init__(self, nlist: int, dim: int = VECTOR_DIM, seed: int = 0):
+        self.nlist = nlist
+        self.centroids = np.zeros((nlist, dim), dtype=np.float32)
+        self.assign = np.zeros(0, dtype=np.int32)  # row -> partition, aligned with MatchIndex rows
+        self._rng = np.random.default_rng(seed)
+        self._order = np.zeros(0, dtype=np.int64)  # rows sorted by partition
+        self._offsets = np.zeros(nlist + 1, dtype=np.int64)  # partition p is _order[_offsets[p]:_offsets[p + 1]]
+        self._dirty: set = set()
+
+    def train(self, matrix: np.ndarray):
+        """Spherical k-means over (a sample of) the normalized rows, then assigns every row."""
+        sample_size = min(len(matrix), self.nlist * self.TRAIN_SAMPLE_PER_LIST)
+        sample = matrix[self._rng.choice(len(matrix), sample_size, replace=False)]
+        self.centroids = sample[self._rng.choice(sample_size, self.nlist, replace=False)].copy()
+
+        for _ in range(self.TRAIN_ITERATIONS):
+            labels = self._nearest(sample)
+            sums = np.zeros_like(self.centroids)
+            np.add.at(sums, labels, sample)
+            counts = np.bincount(labels, minlength=self.nlist)
+            # Re-seed empty partitions from random rows so none stay dead
+            empty = np.flatnonzero(counts == 0)
+            sums[empty] = sample[self._rng.choice(sample_size, len(empty))]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            self.centroids = np.divide(sums, norms, out=np.zeros_like(sums), where=norms > 0)
+
+        self.assign = self._nearest(matrix)
+        self.rebuild_postings(len(matrix))
+
+    def _nearest(self, vectors: np.ndarray) -> np.ndarray:
+        labels = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), self.ASSIGN_CHUNK):
+            block = vectors[start:start + self.ASSIGN_CHUNK]
+            labels[start:start + len(block)] = np.argmax(block @ self.centroids.T, axis=1)
+        return labels
+
+    def rebuild_postings(self, size: int):
+        labels = self.assign[:size]
+        self._order = np.argsort(labels, kind="stable")
+        self._offsets = np.searchsorted(labels[self._order], np.arange(self.nlist + 1))
+        self._dirty.clear()
+
+    # --- Kept in step with MatchIndex's rows ---
+    def set_row(self, row: int, vector: np.ndarray):
+        if row >= len(self.assign):
+            grown = np.zeros(max(2 * len(self.assign), row + 1, 64), dtype=np.int32)
+            grown[:len(self.assign)] = self.assign
+            self.assign = grown
+        self.assign[row] = self._nearest(vector.reshape(1, -1))[0]
+        self._dirty.add(row)
+
+    def move_row(self, source: int, target: int):
+        self.assign[target] = self.assign[source]
+        self._dirty.add(target)
+
+    def candidate_rows(self, query: np.ndarray, nprobe: int, size: int, min_candidates: int = 0) -> np.ndarray:
+        """
+        Rows of the nprobe partitions closest to the (normalized) query. More
+        partitions are probed when needed to return at least min_candidates rows.
+        """
+        if len(self._dirty) > max(1024, size // 20):
+            self.rebuild_postings(size)
+
+        ranked = np.argsort(-(self.centroids @ query))
+        sizes = np.diff(self._offsets)[ranked]
+        needed = int(np.searchsorted(np.cumsum(sizes), min_candidates)) + 1
+        probes = ranked[:min(self.nlist, max(nprobe, needed))]
+
+        parts = [self._order[self._offsets[p]:self._offsets[p + 1]] for p in probes]
+        if self._dirty:
+            parts.append(np.fromiter(self._dirty, dtype=np.int64, count=len(self._dirty)))
+        rows = np.unique(np.concatenate(parts)) if parts else np.zeros(0, dtype=np.int64)
+
+        # Drop rows that were removed or moved to another partition since the last rebuild
+        rows = rows[rows < size]
+        probed = np.zeros(self.nlist, dtype=bool)
+        probed[probes] = True
+        return rows[probed[self.assign[rows]]]
+
+
+class MatchIndex:
+    """
+    Process-resident roommate index.
+
+    Every completed questionnaire lives as one row of a pre-normalized float32
+    matrix, with a parallel array of user ids. Scoring a user against the whole
+    pool is then a single matrix-vector product instead of a Python loop.
+    The raw float64 rows are kept alongside: the quantized answers put many
+    similarities exactly on a percentage boundary, and those rows are re-scored
+    with the exact formula of calculate_cosine_similarity.
+    """
+
+    def __init__(self, dim: int = VECTOR_DIM):
+        self.dim = dim
+        self._matrix = np.zeros((0, dim), dtype=np.float32)
+        self._raw = np.zeros((0, dim), dtype=np.float64)
+        self._norms = np.zeros(0, dtype=np.float64)
+        self._user_ids = np.zeros(0, dtype=np.int64)
+        self._rows: Dict[int, int] = {}  # user_id -> row in _matrix
+        self._size = 0
+
+        self._loaded = False
+        self._loading = False
+        self._pending: Dict[int, Sequence[float]] = {}
+        self._lock = asyncio.Lock()
+        self._watermark: Optional[datetime] = None
+        self._last_refresh = 0.0
+        self._ivf: Optional[IVFPartition] = None  # Only with MATCH_INDEX_BACKEND="ivf"
+        self._ivf_changed: Optional[set] = None  # Rows written while a partition trains off the loop
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._rows
+
+    @property
+    def user_ids(self) -> np.ndarray:
+        return self._user_ids[:self._size]
+
+    @property
+    def matrix(self) -> np.ndarray:
+        return self._matrix[:self._size]
+
+    @property
+    def raw_vectors(self) -> np.ndarray:
+        return self._raw[:self._size]
+
+    # --- 1. LOADING ---
+    async def ensure_loaded(self, db: AsyncSession):
+        """Loads the index on first use and pulls in vectors written by other workers."""
+        if self._loaded and time.monotonic() - self._last_refresh < settings.MATCH_INDEX_REFRESH_SECONDS:
+            return
+
+        async with self._lock:
+            if not self._loaded:
+                await self._load(db)
+            elif time.monotonic() - self._last_refresh >= settings.MATCH_INDEX_REFRESH_SECONDS:
+                await self._refresh(db)
+
+    async def sync(self, db: AsyncSession):
+        """ensure_loaded() without the MATCH_INDEX_REFRESH_SECONDS grace: catches up with the database now."""
+        async with self._lock:
+            if not self._loaded:
+                await self._load(db)
+            else:
+                await self._refresh(db)
+
+    async def _load(self, db: AsyncSession):
+        self._loading = True
+        try:
+            # Read the packed bytes as-is: one join + frombuffer decodes the whole matrix
+            packed = type_coerce(UserVector.vector_data_embeddings, LargeBinary).label("packed")
+            result = await db.execute(
+                select(UserVector.user_id, packed, UserVector.embedding_norm, UserVector.updated_at)
+                .where(UserVector.is_completed == True, UserVector.vector_data_embeddings.is_not(None))
+            )
+            rows = result.all()
+            # Decoding and IVF training take seconds on a big pool: keep them off the event loop.
+            # Meanwhile upserts queue in _pending and searches wait on the lock
+            await asyncio.to_thread(self._load_rows, rows)
+            self._advance_watermark(row.updated_at for row in rows)
+            self._loaded = True
+            self._last_refresh = time.monotonic()
+        finally:
+            self._loading = False
+
+        # Replay vectors submitted while the snapshot was loading
+        pending, self._pending = self._pending, {}
+        for user_id, vector in pending.items():
+            self.upsert(user_id, vector)
+
+    def _load_rows(self, rows):
+        self.bulk_load([row.user_id for row in rows],
+                       unpack_vectors([row.packed for row in rows], self.dim),
+                       norms=np.asarray([row.embedding_norm for row in rows], dtype=np.float64))
+
+    def bulk_load(self, user_ids: Sequence[int], vectors: np.ndarray, norms: Optional[np.ndarray] = None):
+        """
+        Replaces the whole index with the given (n, dim) float64 vectors.
+        `norms` are the stored embedding_norm values; missing ones (NaN) are computed.
+        """
+        count = len(user_ids)
+        self._allocate(max(count, 1))
+        if count:
+            self._raw[:count] = vectors
+            if norms is None:
+                norms = np.full(count, np.nan)
+            missing = np.isnan(norms)
+            norms[missing] = [np.linalg.norm(vector) for vector in vectors[missing]]
+            self._norms[:count] = norms
+            self._matrix[:count] = self._normalize(vectors.astype(np.float32))
+            self._user_ids[:count] = user_ids
+        self._rows = {int(user_id): i for i, user_id in enumerate(user_ids)}
+        self._size = count
+        self._loaded = True
+        self._ivf = self._train_ivf(self.matrix)
+
+    def _train_ivf(self, matrix: np.ndarray) -> Optional[IVFPartition]:
+        """
+        Trains the ANN partition when enabled and the pool is big enough.
+        Centroids are trained once per load: answers come from a fixed
+        questionnaire, so later rows are simply assigned to the nearest one.
+        """
+        if settings.MATCH_INDEX_BACKEND != "ivf" or len(matrix) < max(settings.MATCH_INDEX_IVF_MIN_SIZE, 1):
+            return None
+        nlist = settings.MATCH_INDEX_NLIST or int(np.sqrt(len(matrix)))
+        ivf = IVFPartition(min(nlist, len(matrix)), self.dim)
+        ivf.train(matrix)
+        return ivf
+
+    async def _build_ivf(self):
+        """Trains the partition in a thread on a snapshot, then catches up on rows written meanwhile."""
+        self._ivf_changed = set()
+        try:
+            ivf = await asyncio.to_thread(self._train_ivf, self.matrix.copy())
+        finally:
+            changed, self._ivf_changed = self._ivf_changed, None
+        if ivf is not None:
+            for row in sorted(changed | set(range(len(ivf.assign), self._size))):
+                if row < self._size:
+                    ivf.set_row(row, self._matrix[row])
+        self._ivf = ivf
+
+    async def _refresh(self, db: AsyncSession):
+        """Upserts rows changed since the last sync (e.g. submitted on another worker)."""
+        query = select(UserVector.user_id, UserVector.vector_data_embeddings, UserVector.updated_at).where(
+            UserVector.is_completed == True)
+        if self._watermark is not None:
+            # Overlap the window so rows committed out of order are not skipped; upserts are idempotent
+            overlap = timedelta(seconds=settings.MATCH_INDEX_REFRESH_SECONDS)
+            query = query.where(UserVector.updated_at >= self._watermark - overlap)
+
+        result = await db.execute(query)
+        rows = result.all()
+        for row in rows:
+            if row.vector_data_embeddings is not None:
+                self.upsert(row.user_id, row.vector_data_embeddings)
+        self._advance_watermark(row.updated_at for row in rows)
+        self._last_refresh = time.monotonic()
+        if (self._ivf is None and settings.MATCH_INDEX_BACKEND == "ivf"
+                and self._size >= max(settings.MATCH_INDEX_IVF_MIN_SIZE, 1)):
+            # The pool has grown past MATCH_INDEX_IVF_MIN_SIZE since the load
+            await self._build_ivf()
+
+    def _advance_watermark(self, timestamps):
+        for ts in timestamps:
+            if ts is not None and (self._watermark is None or ts > self._watermark):
+                self._watermark = ts
+
+    # --- 2. IN-PLACE UPDATES ---
+    def upsert(self, user_id: int, vector: Sequence[float]):
+        """Adds or replaces a user's vector. Called right after /test/submit commits."""
+        if self._loading:
+            self._pending[user_id] = vector
+            return
+        if not self._loaded:
+            # The first ensure_loaded() will read this row from the database
+            return
+
+        row = self._rows.get(user_id)
+        if row is None:
+            if self._size == self._matrix.shape[0]:
+                self._grow()
+            row = self._size
+            self._rows[user_id] = row
+            self._user_ids[row] = user_id
+            self._size += 1
+        raw = np.asarray(vector, dtype=np.float64)
+        self._raw[row] = raw
+        self._norms[row] = np.linalg.norm(raw)
+        self._matrix[row] = self._normalize(raw.astype(np.float32).reshape(1, -1))[0]
+        if self._ivf is not None:
+            self._ivf.set_row(row, self._matrix[row])
+        if self._ivf_changed is not None:
+            self._ivf_changed.add(row)
+
+    def remove(self, user_id: int):
+        """Drops a user by moving the last row into its slot."""
+        row = self._rows.pop(user_id, None)
+        if row is None:
+            return
+        last = self._size - 1
+        if row != last:
+            moved_id = int(self._user_ids[last])
+            self._matrix[row] = self._matrix[last]
+            self._raw[row] = self._raw[last]
+            self._norms[row] = self._norms[last]
+            self._user_ids[row] = moved_id
+            self._rows[moved_id] = row
+            if self._ivf is not None:
+                self._ivf.move_row(last, row)
+            if self._ivf_changed is not None:
+                self._ivf_changed.add(row)
+        self._size -= 1
+
+    def _allocate(self, capacity: int):
+        self._matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+        self._raw = np.zeros((capacity, self.dim), dtype=np.float64)
+        self._norms = np.zeros(capacity, dtype=np.float64)
+        self._user_ids = np.zeros(capacity, dtype=np.int64)
+
+    def _grow(self):
+        size = self._size
+        matrix, raw, norms, user_ids = self._matrix, self._raw, self._norms, self._user_ids
+        self._allocate(max(2 * matrix.shape[0], 64))
+        self._matrix[:size] = matrix[:size]
+        self._raw[:size] = raw[:size]
+        self._norms[:size] = norms[:size]
+        self._user_ids[:size] = user_ids[:size]
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        # Zero vectors stay zero, which keeps calculate_cosine_similarity's "0.0" convention
+        return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+    def _exact_similarities(self, rows: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """
+        Same float64 arithmetic as calculate_cosine_similarity, for a subset of rows.
+        One stacked (n, 1, dim) @ (dim, 1) product: matmul runs each row through the
+        same dot kernel as np.dot, bit for bit. A plain matrix-vector product (or a sum
+        of products) rounds differently in the last bit, enough to turn 100 into 99.
+        """
+        query_norm = np.linalg.norm(query)
+        denominators = self._norms[rows] * query_norm
+        dots = np.matmul(self._raw[rows][:, np.newaxis, :], query[:, np.newaxis])[:, 0, 0]
+        return np.divide(dots, denominators, out=np.zeros_like(dots), where=denominators > 0)
+
+    def score_rows(self, rows: np.ndarray, query: Sequence[float]) -> np.ndarray:
+        """Exact 0-100 match scores of the given rows against a query vector."""
+        raw_query = np.asarray(query, dtype=np.float64)
+        q = self._normalize(raw_query.astype(np.float32).reshape(1, -1))[0]
+        percentages = (self._matrix[rows] @ q).astype(np.float64) * 100
+        scores = np.floor(np.clip(percentages, 0, None)).astype(np.int64)
+
+        # Only rows sitting next to a percentage boundary can be floored differently in float32
+        ambiguous = np.flatnonzero(np.abs(percentages - np.rint(percentages)) < _BOUNDARY_TOLERANCE)
+        if ambiguous.size:
+            scores[ambiguous] = calculate_match_scores(
+                self._exact_similarities(rows[ambiguous], raw_query))
+        return scores
+
+    def rows_for(self, user_ids: Sequence[int]) -> np.ndarray:
+        """Matrix rows of the given users; users not in the index are skipped."""
+        rows = self._rows
+        return np.fromiter((rows[u] for u in user_ids if u in rows), dtype=np.int64)
+
+    # --- 3. SEARCH ---
+    def search(
+        self,
+        query: Sequence[float],
+        k: Optional[int] = None,
+        exclude_user_id: Optional[int] = None,
+        after: Optional[Tuple[int, int]] = None,
+        nprobe: Optional[int] = None,
+        exact: bool = False
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns (user_ids, match scores) of the k best matches, ordered by
+        score desc then user_id asc. k=None ranks the whole pool.
+        `after` is a (score, user_id) cursor: only entries ranked after it are returned.
+
+        With the IVF backend active, only the nprobe closest partitions are
+        scanned (default MATCH_INDEX_NPROBE); exact=True or k=None scans everything.
+        """
+        if self._ivf is None or exact or k is None:
+            return self.rank_rows(np.arange(self._size), query, k, exclude_user_id, after)
+
+        q = self._normalize(np.asarray(query, dtype=np.float32).reshape(1, -1))[0]
+        nprobe = nprobe or settings.MATCH_INDEX_NPROBE
+        while True:
+            rows = self._ivf.candidate_rows(q, nprobe, self._size, min_candidates=k + 1)
+            user_ids, scores = self.rank_rows(rows, query, k, exclude_user_id, after)
+            # A cursor page deep in the ranking can use up the probed partitions while unscored
+            # users remain: widen the probe until the page fills or every partition is scanned
+            if len(user_ids) >= k or after is None or nprobe >= self._ivf.nlist:
+                return user_ids, scores
+            nprobe *= 4
+
+    def rank_rows(
+        self,
+        rows: np.ndarray,
+        query: Sequence[float],
+        k: Optional[int] = None,
+        exclude_user_id: Optional[int] = None,
+        after: Optional[Tuple[int, int]] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """search() restricted to a subset of matrix rows."""
+        if exclude_user_id is not None and exclude_user_id in self._rows:
+            rows = rows[rows != self._rows[exclude_user_id]]
+        if rows.size == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+        scores = self.score_rows(rows, query)
+        user_ids = self._user_ids[rows]
+
+        if after is not None:
+            after_score, after_user_id = after
+            keep = (scores < after_score) | ((scores == after_score) & (user_ids > after_user_id))
+            scores, user_ids = scores[keep], user_ids[keep]
+
+        k = len(scores) if k is None else min(k, len(scores))
+        if k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+        # One int64 sort key: higher score first, then lower user_id
+        keys = (100 - scores) * (int(user_ids.max()) + 1) + user_ids
+        if k < len(keys):
+            top = np.argpartition(keys, k - 1)[:k]
+        else:
+            top = np.arange(len(keys))
+        top = top[np.argsort(keys[top])]
+        return user_ids[top], scores[top]
+
+
+match_index = MatchIndex()
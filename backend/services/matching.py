@@ -2,12 +2,18 @@ import numpy as np
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from models.user import UserVector, User
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
+
+from services.match_index import match_index
+from services.top_matches import read_top_matches
+
+DEFAULT_AVATAR = "https://t4.ftcdn.net/jpg/00/64/67/27/360_F_64672736_U5kpdGs9keUll8CRQ3p3YaEv2M6qkVY5.jpg"
 
 
 def calculate_cosine_similarity(vector1: list, vector2: list) -> float:
     """Calculate cosine similarity between two vectors."""
-    if not vector1 or not vector2:
+    # Stored vectors come back as ndarrays, whose truth value is ambiguous: check length
+    if vector1 is None or vector2 is None or len(vector1) == 0 or len(vector2) == 0:
         return 0.0
 
     v1 = np.array(vector1)
@@ -58,28 +64,111 @@ async def find_top_matches(
     # Get current user's vector
     user_vector = await get_user_vector(db, current_user_id)
 
-    if not user_vector or not user_vector.vector_data_embeddings:
+    if not user_vector or user_vector.vector_data_embeddings is None:
         return []
 
-    # Get all candidate vectors
-    candidates = await get_candidate_vectors(db, current_user_id)
+    # Score everyone in one pass over the in-memory index
+    await match_index.ensure_loaded(db)
+    user_ids, scores = match_index.search(
+        user_vector.vector_data_embeddings, k=limit, exclude_user_id=current_user_id)
+
+    # Hydrate only the winners
+    result = await db.execute(select(User.id, User.username).where(User.id.in_(user_ids.tolist())))
+    usernames = {row.id: row.username for row in result.all()}
+
+    return [
+        {"user_id": int(user_id), "username": usernames[int(user_id)], "match_score": int(score)}
+        for user_id, score in zip(user_ids, scores)
+        if int(user_id) in usernames
+    ]
+
+
+async def get_match_page(
+    db: AsyncSession,
+    current_user_id: int,
+    my_vector_row: UserVector | None,
+    limit: int,
+    after: Optional[Tuple[int, int]] = None,
+    district: Optional[List[str]] = None,
+    budget: Optional[List[str]] = None,
+    gender: Optional[str] = None
+) -> Tuple[List[Dict], Optional[Tuple[int, int]]]:
+    """
+    One page of match profiles, best first, plus the (score, user_id) to continue
+    after (None on the last page). district/budget/gender are hard filters applied
+    in SQL before scoring.
+    """
+    # If I haven't taken the test, I can't be matched
+    if not my_vector_row or my_vector_row.vector_data_embeddings is None:
+        return [], None
+
+    my_vector_data = my_vector_row.vector_data_embeddings
+
+    # 1. Score All Candidates, keep only this page (+1 to know whether another page exists)
+    user_ids = None
+    filtered = bool(district or budget or gender)
+    if not filtered and my_vector_row.top_match_floor is not None:
+        # Precomputed list: a single indexed read
+        user_ids, scores = await read_top_matches(db, current_user_id, limit + 1, after)
+        if len(user_ids) <= limit and my_vector_row.top_match_floor != -1:
+            user_ids = None # The page runs past the stored top-N: rank it from the index
+
+    if user_ids is None:
+        await match_index.ensure_loaded(db)
+        if filtered:
+            # Hard filters narrow the pool on indexed columns; only the survivors are scored
+            query = select(UserVector.user_id).where(UserVector.is_completed == True,
+                                                     UserVector.user_id != current_user_id)
+            if district:
+                query = query.where(UserVector.district.in_(district))
+            if budget:
+                query = query.where(UserVector.budget.in_(budget))
+            if gender:
+                query = query.join(User, User.id == UserVector.user_id).where(User.gender == gender)
+            candidate_ids = (await db.execute(query)).scalars().all()
+            user_ids, scores = match_index.rank_rows(
+                match_index.rows_for(candidate_ids), my_vector_data, k=limit + 1, after=after)
+        else:
+            user_ids, scores = match_index.search(
+                my_vector_data, k=limit + 1, exclude_user_id=current_user_id, after=after)
+
+    next_after = None
+    if len(user_ids) > limit:
+        next_after = (int(scores[limit - 1]), int(user_ids[limit - 1]))
+        user_ids, scores = user_ids[:limit], scores[:limit]
+
+    # 2. Load Profiles for just this page in one query
+    result = await db.execute(
+        select(User, UserVector.responses)
+        .join(UserVector, UserVector.user_id == User.id)
+        .where(User.id.in_(user_ids.tolist()))
+    )
+    profiles = {user.id: (user, responses) for user, responses in result.all()}
 
-    # Calculate similarity scores
     matches = []
-    for vec_row, user_row in candidates:
-        if not vec_row.vector_data_embeddings:
+
+    # Already sorted by highest score
+    for user_id, real_score in zip(user_ids.tolist(), scores.tolist()):
+        if user_id not in profiles:
             continue
+        user, responses = profiles[user_id]
 
-        similarity = calculate_cosine_similarity(
-            user_vector.vector_data_embeddings, vec_row.vector_data_embeddings)
-        score = calculate_match_score(similarity)
+        # 3. Get Metadata (District)
+        user_district = "Ho Chi Minh City"
+        if responses:
+             user_district = responses.get('district', user_district)
 
+        # 4. Build Profile Object
         matches.append({
-            "user_id": user_row.id,
-            "username": user_row.username,
-            "match_score": score
+            "user_id": user.id,
+            "username": user.username,
+            "full_name": user.full_name or user.username,
+            "age": user.age or 20,
+            "university": user.university or "University",
+            "major": user.major or "Student",
+            "district": user_district,
+            "match_score": real_score, # <--- The calculated score
+            "avatar_url": DEFAULT_AVATAR
         })
 
-    # Sort by score and return top matches
-    matches.sort(key=lambda x: x["match_score"], reverse=True)
-    return matches[:limit]
+    return matches, next_after
@@ -0,0 +1,132 @@
+import asyncio
+from typing import List, Optional, Tuple
+
+from sqlalchemy import insert
+
+from core.config import settings
+from core.database import AsyncLocalSession
+from models.message import Message
+
+# (sender_id, receiver_id, content, future resolved with (id, timestamp))
+PendingMessage = Tuple[int, int, str, asyncio.Future]
+
+
+class MessageSink:
+    """
+    Write-behind persistence for chat messages.
+
+    Senders enqueue into a bounded queue and get a future back; one background
+    task drains the queue and bulk-inserts a batch every `batch_size` messages
+    or every `flush_interval` seconds, whichever comes first. The future is
+    resolved with the row's (id, timestamp) once its batch has committed.
+
+    A batch that fails is retried one message at a time, so a bad row (e.g. a
+    receiver that does not exist) only fails its own future.
+    """
+
+    def __init__(self, batch_size: int, flush_interval: float, max_queue: int):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self.batches_written = 0
+        self.messages_written = 0
+        self.failed_messages = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    # --- 1. LIFECYCLE (wired into main.py's lifespan) ---
+    async def start(self):
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flushes everything still queued, then stops the writer."""
+        if not self.running:
+            return
+        await self._queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    # --- 2. PRODUCER SIDE ---
+    async def submit(self, sender_id: int, receiver_id: int, content: str) -> asyncio.Future:
+        """
+        Queues a message and returns a future for its (id, timestamp).
+        Waits for room when the queue is full, so a DB stall pushes back on senders.
+        """
+        future = asyncio.get_running_loop().create_future()
+        if not self.running:
+            # No writer (e.g. a script without the app lifespan): write straight through
+            await self._write([(sender_id, receiver_id, content, future)])
+            return future
+        await self._queue.put((sender_id, receiver_id, content, future))
+        return future
+
+    # --- 3. WRITER SIDE ---
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            deadline = asyncio.get_running_loop().time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - asyncio.get_running_loop().time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self._write(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _write(self, batch: List[PendingMessage]):
+        try:
+            async with AsyncLocalSession() as db:
+                result = await db.execute(
+                    insert(Message).returning(Message.id, Message.timestamp, sort_by_parameter_order=True),
+                    [{"sender_id": s, "receiver_id": r, "content": c} for s, r, c, _ in batch],
+                )
+                saved = result.all()
+                await db.commit()
+        except Exception as db_error:
+            if len(batch) > 1:
+                # One bad row fails the whole INSERT: isolate it
+                print(f"Batch of {len(batch)} messages failed ({db_error}), retrying one by one")
+                for message in batch:
+                    await self._write([message])
+                return
+            print(f"Database error: {db_error}")
+            self.failed_messages += 1
+            future = batch[0][3]
+            if not future.done():
+                future.set_exception(db_error)
+            return
+
+        self.batches_written += 1
+        self.messages_written += len(batch)
+        for (*_, future), row in zip(batch, saved):
+            if not future.done():
+                future.set_result((row.id, row.timestamp))
+
+
+message_sink = MessageSink(
+    batch_size=settings.MESSAGE_SINK_BATCH_SIZE,
+    flush_interval=settings.MESSAGE_SINK_FLUSH_MS / 1000,
+    max_queue=settings.MESSAGE_SINK_QUEUE_SIZE,
+)
@@ -0,0 +1,193 @@
+import asyncio
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import Integer, and_, any_, case, delete, func, insert, literal, or_, select, tuple_, update
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import settings
+from core.database import AsyncLocalSession
+from models.user import UserTopMatch, UserVector
+from services.match_index import match_index
+
+
+MAINTENANCE_ATTEMPTS = 3
+
+# Held, transaction-scoped, by every writer of user_top_matches: lists are maintained one
+# submit at a time across workers, so each scores against every vector committed before it
+TOP_MATCHES_LOCK_KEY = 0x746f706d # Any app-wide constant
+
+# Strong references so maintenance tasks are not garbage-collected mid-flight
+pending_updates: set[asyncio.Task] = set()
+
+
+async def lock_top_matches(db: AsyncSession):
+    """Takes TOP_MATCHES_LOCK_KEY until the transaction ends."""
+    await db.execute(select(func.pg_advisory_xact_lock(TOP_MATCHES_LOCK_KEY)))
+
+
+# --- 1. INCREMENTAL UPDATE (after /test/submit) ---
+def schedule_top_matches_update(user_id: int, vector: Sequence[float]):
+    """
+    Runs maintain_top_matches in the background, once the submitted vector has
+    committed: a failure in list maintenance must not fail the submit itself.
+    """
+    task = asyncio.create_task(maintain_top_matches(user_id, vector))
+    pending_updates.add(task)
+    task.add_done_callback(pending_updates.discard)
+
+
+async def finish_top_matches_updates():
+    """Waits for scheduled updates (called on shutdown)."""
+    if pending_updates:
+        await asyncio.gather(*pending_updates, return_exceptions=True)
+
+
+async def maintain_top_matches(user_id: int, vector: Sequence[float]):
+    """update_top_matches with retries. If it keeps failing, the lists it would touch are marked stale."""
+    for attempt in range(1, MAINTENANCE_ATTEMPTS + 1):
+        try:
+            async with AsyncLocalSession() as db:
+                await update_top_matches(db, user_id, vector)
+            return
+        except Exception as e:
+            print(f"⚠️ Top-match update for user {user_id} failed (attempt {attempt}/{MAINTENANCE_ATTEMPTS}): {e}")
+            if attempt < MAINTENANCE_ATTEMPTS:
+                await asyncio.sleep(0.1 * 2 ** attempt)
+
+    # A NULL floor sends /matches/my-matches back to the index until rebuild_top_matches.py runs
+    try:
+        async with AsyncLocalSession() as db:
+            await lock_top_matches(db)
+            user_ids, scores = match_index.search(vector, exclude_user_id=user_id)
+            entering = _entering_lists(user_ids, scores).subquery()
+            await db.execute(update(UserVector)
+                             .where(or_(UserVector.user_id == user_id,
+                                        UserVector.user_id.in_(select(entering.c.user_id))))
+                             .values(top_match_floor=None))
+            await db.commit()
+        print(f"⚠️ Marked the match lists around user {user_id} stale: run rebuild_top_matches.py")
+    except Exception as e:
+        print(f"❌ Could not mark match lists stale after user {user_id}'s submit: {e}")
+
+
+async def update_top_matches(db: AsyncSession, user_id: int, vector: Sequence[float]):
+    """
+    Scores a newly submitted vector against the whole pool once, stores the
+    user's own top-N and inserts them into every other list they now belong in,
+    in one transaction.
+    """
+    size = settings.TOP_MATCHES_SIZE
+
+    # 1. One update at a time, scored against every committed vector: this worker's index
+    # may not have refreshed yet after a submit on another worker
+    await lock_top_matches(db)
+    await match_index.sync(db)
+    user_ids, scores = match_index.search(vector, exclude_user_id=user_id)  # Exact, best first
+
+    # 2. The newcomer's own list is just the head of the ranking
+    await db.execute(delete(UserTopMatch).where(UserTopMatch.user_id == user_id))
+    if len(user_ids):
+        await db.execute(insert(UserTopMatch), [
+            {"user_id": user_id, "match_user_id": int(match_id), "score": int(score)}
+            for match_id, score in zip(user_ids[:size], scores[:size])
+        ])
+    floor = int(scores[size - 1]) if len(scores) >= size else -1
+    await db.execute(update(UserVector).where(UserVector.user_id == user_id).values(top_match_floor=floor))
+
+    # 3. Every other list the newcomer now belongs in
+    await offer_to_lists(db, user_id, user_ids, scores)
+    await db.commit()
+
+
+def _candidates(user_ids, scores):
+    """(user_id, score) rows from two parallel arrays, as one unnest() in the FROM clause."""
+    return func.unnest(
+        literal([int(u) for u in user_ids], ARRAY(Integer)), literal([int(s) for s in scores], ARRAY(Integer))
+    ).table_valued("user_id", "score").render_derived(name="candidates")
+
+
+def _entering_lists(user_ids: np.ndarray, scores: np.ndarray):
+    """(user_id, score) for every list among user_ids whose own floor the score reaches."""
+    candidates = _candidates(user_ids, scores)
+    return (
+        select(candidates.c.user_id, candidates.c.score)
+        .join(UserVector, UserVector.user_id == candidates.c.user_id)
+        .where(UserVector.top_match_floor.is_not(None), candidates.c.score >= UserVector.top_match_floor)
+    )
+
+
+async def offer_to_lists(db: AsyncSession, match_user_id: int, user_ids: np.ndarray, scores: np.ndarray):
+    """
+    Inserts match_user_id into the lists of user_ids whose floor it reaches,
+    then trims those lists back to N and refreshes their floors.
+    """
+    if not len(user_ids):
+        return
+    # 1. Each floor is compared in SQL; only the lists that pass are locked, in user_id order
+    entering = (await db.execute(
+        _entering_lists(user_ids, scores).order_by(UserVector.user_id).with_for_update(of=UserVector)
+    )).all()
+    if not entering:
+        return
+
+    # 2. Insert into those lists, then cut them back to N
+    candidates = _candidates([row.user_id for row in entering], [row.score for row in entering])
+    stmt = pg_insert(UserTopMatch).from_select(
+        ["user_id", "match_user_id", "score"],
+        select(candidates.c.user_id, literal(match_user_id, Integer), candidates.c.score))
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[UserTopMatch.user_id, UserTopMatch.match_user_id], set_={"score": stmt.excluded.score})
+    await db.execute(stmt)
+    await trim_lists(db, [row.user_id for row in entering])
+
+
+async def trim_lists(db: AsyncSession, user_ids: List[int]):
+    """Cuts the given lists back to their best N entries and recomputes their floors."""
+    size = settings.TOP_MATCHES_SIZE
+    in_lists = UserTopMatch.user_id == any_(literal(list(user_ids), ARRAY(Integer)))
+
+    ranked = select(
+        UserTopMatch.user_id,
+        UserTopMatch.match_user_id,
+        func.row_number().over(
+            partition_by=UserTopMatch.user_id,
+            order_by=(UserTopMatch.score.desc(), UserTopMatch.match_user_id)
+        ).label("rank")
+    ).where(in_lists).subquery()
+    overflow = select(ranked.c.user_id, ranked.c.match_user_id).where(ranked.c.rank > size)
+    await db.execute(delete(UserTopMatch).where(
+        tuple_(UserTopMatch.user_id, UserTopMatch.match_user_id).in_(overflow)))
+
+    floors = (
+        select(UserTopMatch.user_id,
+               case((func.count() >= size, func.min(UserTopMatch.score)), else_=-1).label("floor"))
+        .where(in_lists)
+        .group_by(UserTopMatch.user_id)
+        .subquery()
+    )
+    await db.execute(
+        update(UserVector).where(UserVector.user_id == floors.c.user_id).values(top_match_floor=floors.c.floor))
+
+
+# --- 2. READ (/matches/my-matches) ---
+async def read_top_matches(
+    db: AsyncSession,
+    user_id: int,
+    limit: int,
+    after: Optional[Tuple[int, int]] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    One page of the stored list as (user_ids, scores), ordered like MatchIndex.search.
+    Returns fewer than `limit` entries when the page runs past the stored N.
+    """
+    query = select(UserTopMatch.match_user_id, UserTopMatch.score).where(UserTopMatch.user_id == user_id)
+    if after is not None:
+        after_score, after_user_id = after
+        query = query.where(or_(UserTopMatch.score < after_score,
+                                and_(UserTopMatch.score == after_score, UserTopMatch.match_user_id > after_user_id)))
+    query = query.order_by(UserTopMatch.score.desc(), UserTopMatch.match_user_id).limit(limit)
+    rows = (await db.execute(query)).all()
+    return (np.asarray([row.match_user_id for row in rows], dtype=np.int64),
+            np.asarray([row.score for row in rows], dtype=np.int64))
@@ -0,0 +1,119 @@
+import pytest
+from sqlalchemy import delete, update
+
+from core.database import AsyncLocalSession
+from models.user import User
+from routers.auth import CurrentUser, create_access_token, invalidate_cached_user, revoke_user_tokens, user_cache
+from services.vector_logic import (
+    SLEEP_MAP, CLEANLINESS_MAP, NOISE_MAP, GUEST_MAP, BUDGET_MAP, PRIORITY_MAP,
+)
+
+pytestmark = pytest.mark.anyio
+
+# Every kind of authenticated route: full user (onboarding) and id-only (the rest)
+PROTECTED = ["/onboarding/profile", "/test/status", "/matches/my-matches", "/listings/recommendations",
+             "/chat/conversations", "/explore/feed"]
+
+SUBMISSION = {
+    "sleep_schedule": next(iter(SLEEP_MAP)),
+    "cleanliness": next(iter(CLEANLINESS_MAP)),
+    "noise_tolerance": next(iter(NOISE_MAP)),
+    "guest_frequency": next(iter(GUEST_MAP)),
+    "budget": next(iter(BUDGET_MAP)),
+    "priority": next(iter(PRIORITY_MAP)),
+    "district": "District 1",
+}
+
+
+def bearer(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+async def test_revoked_token_is_rejected_everywhere(client, make_user):
+    user_id, token = await make_user()
+    for path in PROTECTED:
+        response = await client.get(path, headers=bearer(token))
+        assert response.status_code == 200, path
+
+    async with AsyncLocalSession() as db:
+        await revoke_user_tokens(db, user_id)
+
+    for path in PROTECTED:
+        response = await client.get(path, headers=bearer(token))
+        assert response.status_code == 401, path
+
+    # A token issued after the bump works
+    async with AsyncLocalSession() as db:
+        user = await db.get(User, user_id)
+        fresh = await create_access_token(user.username, user_id, token_version=user.token_version)
+    response = await client.get("/test/status", headers=bearer(fresh))
+    assert response.status_code == 200
+
+
+async def test_revocation_on_another_worker_applies_once_the_cache_entry_expires(client, make_user):
+    user_id, token = await make_user()
+    assert (await client.get("/test/status", headers=bearer(token))).status_code == 200
+
+    # Another worker bumped token_version: this one still has the old entry cached
+    async with AsyncLocalSession() as db:
+        await db.execute(update(User).where(User.id == user_id).values(token_version=User.token_version + 1))
+        await db.commit()
+    user_cache.clear() # What USER_CACHE_TTL_SECONDS does
+
+    assert (await client.get("/matches/my-matches", headers=bearer(token))).status_code == 401
+
+
+async def test_deleted_user_is_rejected(client, make_user):
+    user_id, token = await make_user()
+    assert (await client.get("/test/status", headers=bearer(token))).status_code == 200
+
+    async with AsyncLocalSession() as db:
+        await db.execute(delete(User).where(User.id == user_id))
+        await db.commit()
+    invalidate_cached_user(user_id)
+
+    # Used to reach the handler and fail on the user_vectors foreign key (500)
+    response = await client.post("/test/submit", headers=bearer(token), json=SUBMISSION)
+    assert response.status_code == 401
+
+
+async def test_cached_user_is_a_read_only_snapshot(client, make_user):
+    user_id, token = await make_user()
+    assert (await client.get("/onboarding/profile", headers=bearer(token))).status_code == 200
+
+    cached = user_cache.get(user_id)
+    assert isinstance(cached, CurrentUser)
+    with pytest.raises(Exception):
+        cached.username = "changed"
+
+
+async def test_logout_revokes_every_session(client, make_user):
+    user_id, token = await make_user()
+    async with AsyncLocalSession() as db:
+        user = await db.get(User, user_id)
+        other_device = await create_access_token(user.username, user_id, token_version=user.token_version)
+
+    assert (await client.post("/auth/logout", headers=bearer(token))).status_code == 204
+    for stale in (token, other_device):
+        assert (await client.get("/test/status", headers=bearer(stale))).status_code == 401
+
+
+async def test_password_change_revokes_old_tokens(client, make_user):
+    user_id, token = await make_user(password="old-secret")
+
+    response = await client.post("/auth/password", headers=bearer(token),
+                                 json={"current_password": "wrong", "new_password": "new-secret"})
+    assert response.status_code == 401
+    assert (await client.get("/test/status", headers=bearer(token))).status_code == 200
+
+    response = await client.post("/auth/password", headers=bearer(token),
+                                 json={"current_password": "old-secret", "new_password": "new-secret"})
+    assert response.status_code == 200
+    assert (await client.get("/test/status", headers=bearer(token))).status_code == 401
+    fresh = response.json()["access_token"]
+    assert (await client.get("/test/status", headers=bearer(fresh))).status_code == 200
+
+    async with AsyncLocalSession() as db:
+        username = (await db.get(User, user_id)).username
+    login = await client.post("/auth/token", data={"username": username, "password": "new-secret"})
+    assert login.status_code == 200
@@ -0,0 +1,48 @@
+import pytest
+
+from core.database import AsyncLocalSession
+from models.message import Message
+
+pytestmark = pytest.mark.anyio
+
+
+def bearer(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+async def send(sender_id: int, receiver_id: int, content: str) -> int:
+    async with AsyncLocalSession() as db:
+        message = Message(sender_id=sender_id, receiver_id=receiver_id, content=content)
+        db.add(message)
+        await db.commit()
+        return message.id
+
+
+async def test_mark_read_rejects_unknown_partners_and_foreign_messages(client, make_user):
+    (me, token), (partner, _), (other, _) = [await make_user() for _ in range(3)]
+    mine = await send(partner, me, "hi")
+    foreign = await send(partner, other, "not for you")
+
+    response = await client.post("/chat/read/2147483647", headers=bearer(token))
+    assert response.status_code == 404
+
+    response = await client.post(f"/chat/read/{partner}", params={"message_id": foreign}, headers=bearer(token))
+    assert response.status_code == 404
+
+    response = await client.post(f"/chat/read/{partner}", params={"message_id": mine}, headers=bearer(token))
+    assert response.status_code == 200
+    assert response.json()["last_read_message_id"] == mine
+
+
+async def test_history_before_ignores_messages_of_other_conversations(client, make_user):
+    (me, token), (partner, _), (other, _) = [await make_user() for _ in range(3)]
+    ours = [await send(me, partner, f"message {n}") for n in range(3)]
+    foreign = await send(partner, other, "newer, elsewhere")
+
+    response = await client.get(f"/chat/history/{partner}", params={"before": ours[-1]}, headers=bearer(token))
+    assert [message["id"] for message in response.json()] == ours[:-1]
+
+    # A foreign id must not shift the window (it is newer than everything here)
+    response = await client.get(f"/chat/history/{partner}", params={"before": foreign}, headers=bearer(token))
+    assert response.status_code == 200
+    assert response.json() == []
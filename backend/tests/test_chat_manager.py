@@ -0,0 +1,166 @@
+import asyncio
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+from core.config import settings
+from routers.chat import confirm_saved
+from services.chat_manager import ChatBroker, ConnectionManager, PostgresBroker, manager as app_manager
+
+pytestmark = pytest.mark.anyio
+
+
+class FlakyBroker(ChatBroker):
+    """Fails its first start, like a database that is still booting."""
+
+    def __init__(self):
+        self.starts = 0
+        self.connected = False
+        self.events = []
+
+    async def start(self, handler):
+        await super().start(handler)
+        self.starts += 1
+        if self.starts == 1:
+            raise OSError("database is starting up")
+        self.connected = True
+
+    @property
+    def healthy(self) -> bool:
+        return self.connected
+
+    async def publish(self, event: dict):
+        if not self.connected:
+            raise OSError("not connected")
+        self.events.append(event)
+
+
+def test_broker_must_implement_publish():
+    with pytest.raises(TypeError):
+        ChatBroker()
+
+
+async def test_broker_is_retried_when_the_first_connect_fails(monkeypatch):
+    monkeypatch.setattr(settings, "CHAT_PRESENCE_HEARTBEAT_SECONDS", 0.01)
+    broker = FlakyBroker()
+    manager = ConnectionManager(broker)
+
+    with pytest.raises(OSError):
+        await manager.start()
+    try:
+        for _ in range(100):
+            if broker.connected:
+                break
+            await asyncio.sleep(0.01)
+        assert broker.connected
+        assert {"type": "hello", "worker": manager.worker_id} in broker.events
+    finally:
+        await manager.stop()
+
+
+class FakeSocket:
+    """Records what a ClientConnection does to its socket; send_text can be made to fail."""
+
+    def __init__(self, fail_sends: bool = False, stall_sends: bool = False):
+        self.fail_sends = fail_sends
+        self.stall_sends = stall_sends
+        self.sent = []
+        self.close_code = None
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message: str):
+        if self.fail_sends:
+            raise RuntimeError("connection reset")
+        if self.stall_sends:
+            await asyncio.Event().wait()
+        self.sent.append(message)
+
+    async def close(self, code: int = 1000):
+        self.close_code = code
+
+
+async def test_socket_is_closed_when_a_send_fails():
+    manager = ConnectionManager()
+    socket = FakeSocket(fail_sends=True)
+    await manager.connect(socket, 1)
+
+    await manager.send_personal_message("hi", 1)
+    for _ in range(100):
+        if socket.close_code is not None:
+            break
+        await asyncio.sleep(0.01)
+
+    assert socket.close_code == 1011
+    assert not manager.is_online(1)
+    assert manager.send_errors == 1
+
+
+async def test_save_acks_go_through_the_connection_writer():
+    socket = FakeSocket()
+    connection = await app_manager.connect(socket, 1)
+    try:
+        saved, lost = asyncio.get_running_loop().create_future(), asyncio.get_running_loop().create_future()
+        saved.set_result((7, datetime(2026, 1, 1, tzinfo=timezone.utc)))
+        lost.set_exception(OSError("database down"))
+        confirm_saved(connection, saved, client_id="a")
+        confirm_saved(connection, lost, client_id="b")
+        for _ in range(100):
+            if len(socket.sent) == 2:
+                break
+            await asyncio.sleep(0.01)
+
+        assert [json.loads(frame) for frame in socket.sent] == [
+            {"ack": "a", "id": 7, "timestamp": "2026-01-01T00:00:00+00:00"},
+            {"error": "Message could not be saved", "client_id": "b"},
+        ]
+    finally:
+        app_manager.remove(connection)
+
+
+async def test_acks_to_a_stuck_socket_are_bounded(monkeypatch):
+    monkeypatch.setattr(settings, "CHAT_OUTBOUND_QUEUE_SIZE", 2)
+    socket = FakeSocket(stall_sends=True)
+    connection = await app_manager.connect(socket, 1)
+    saved = asyncio.get_running_loop().create_future()
+    saved.set_result((7, datetime(2026, 1, 1, tzinfo=timezone.utc)))
+
+    for _ in range(5):
+        confirm_saved(connection, saved, client_id="a")
+    await asyncio.sleep(0.01)
+
+    # The queue never grows past its bound: the slow consumer is dropped and closed instead
+    assert connection.queue.qsize() <= 2
+    assert not app_manager.is_online(1)
+    assert socket.close_code == 1013
+
+
+async def test_incomplete_chunked_events_are_expired():
+    broker = PostgresBroker()
+    received = []
+
+    async def handler(event):
+        received.append(event)
+
+    broker._handler = handler
+    broker.CHUNK_TTL_SECONDS = 0
+    # First half of an event whose publisher died, then a complete one-chunk event
+    broker._on_notify(None, 0, broker.CHANNEL, json.dumps({"chunk": "lost", "index": 0, "count": 2, "data": "{"}))
+    broker._on_notify(None, 0, broker.CHANNEL,
+                      json.dumps({"chunk": "ok", "index": 0, "count": 1, "data": json.dumps({"type": "x"})}))
+    await asyncio.sleep(0)
+
+    assert received == [{"type": "x"}]
+    assert broker._partial == {}
+    assert broker.expired_events == 1
+
+
+async def test_partial_buffers_are_capped():
+    broker = PostgresBroker()
+    broker._handler = None
+    for n in range(broker.MAX_PARTIAL_EVENTS + 10):
+        broker._on_notify(None, 0, broker.CHANNEL, json.dumps({"chunk": str(n), "index": 0, "count": 2, "data": ""}))
+    assert len(broker._partial) == broker.MAX_PARTIAL_EVENTS
+    assert "0" not in broker._partial
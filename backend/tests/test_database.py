@@ -0,0 +1,56 @@
+import pytest
+from sqlalchemy import exc, insert, select, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from core import database
+from core.config import settings
+from core.database import AsyncLocalSession, SlowQueryLog, TimedQueuePool, engine, pool_metrics
+from models.message import Message
+from models.user import User
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_pool_records_checkout_waits_and_timeouts(client):
+    small = create_async_engine(settings.DATABASE_URL, poolclass=TimedQueuePool,
+                                pool_size=1, max_overflow=0, pool_timeout=0.1)
+    checkouts, timeouts = pool_metrics.checkouts, pool_metrics.timeouts
+    try:
+        async with small.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            with pytest.raises(exc.TimeoutError):
+                async with small.connect():
+                    pass
+    finally:
+        await small.dispose()
+
+    assert pool_metrics.checkouts - checkouts == 2
+    assert pool_metrics.timeouts - timeouts == 1
+    assert pool_metrics.wait_seconds_max >= 0.1
+
+
+async def test_slow_query_log_redacts_parameters(client, make_user, monkeypatch, capsys):
+    (sender, _), (receiver, _) = await make_user(), await make_user()
+    monkeypatch.setattr(settings, "DB_SLOW_QUERY_REDACT", "email,content")
+    log = SlowQueryLog()
+    log.threshold_seconds = 0 # Every statement is slow
+    monkeypatch.setattr(database, "slow_query_log", log)
+
+    async with AsyncLocalSession() as db:
+        await db.execute(select(User.id).where(User.email == "someone@example.com",
+                                               User.username == "visible_name", User.bio == "x" * 200))
+        await db.execute(insert(Message), [{"sender_id": sender, "receiver_id": receiver, "content": "hi"}] * 2)
+        await db.rollback()
+    async with engine.connect() as conn:
+        await conn.exec_driver_sql("SELECT $1::text", ("driver_value",))
+
+    lines = [line for line in capsys.readouterr().out.splitlines() if line.startswith("🐢 Slow SQL")]
+    logged = "\n".join(lines)
+    # Redacted names are masked, others shown (long values cut), bulk inserts counted, raw values never shown
+    assert "email_1=***" in logged
+    assert "someone@example.com" not in logged
+    assert "username_1='visible_name'" in logged
+    assert "'" + "x" * 79 + "..." in logged and "x" * 81 not in logged
+    assert "<2 rows>" in logged and "'hi'" not in logged
+    assert "$1=***" in logged and "driver_value" not in logged
+    assert all("[background]" in line for line in lines) # Not served by a request
@@ -0,0 +1,57 @@
+import csv
+import uuid
+
+import pytest
+from sqlalchemy import column, select
+
+from core.database import AsyncLocalSession
+from import_listings import import_feed
+from models.listing import Listing
+
+pytestmark = pytest.mark.anyio
+
+FIELDS = ["external_id", "title", "price", "size", "district", "images", "features", "description"]
+
+
+def write_feed(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+async def imported(source: str) -> dict:
+    """external_id -> (id, price, xmin): xmin changes whenever Postgres rewrites the row."""
+    async with AsyncLocalSession() as db:
+        rows = await db.execute(select(Listing.external_id, Listing.id, Listing.price, column("xmin"))
+                                .where(Listing.source == source))
+        return {row[0]: tuple(row[1:]) for row in rows.all()}
+
+
+async def test_reimporting_a_feed_is_idempotent(client, make_user, tmp_path):
+    owner, _ = await make_user()
+    source = f"test_{uuid.uuid4().hex[:12]}"
+    feed = [{"external_id": str(n), "title": f"Room {n}", "price": 2_000_000 + n, "size": 20,
+             "district": "District 3", "images": "a.jpg|b.jpg", "features": "Wifi", "description": ""}
+            for n in range(5)]
+    path = tmp_path / "feed.csv"
+    # Room 0 twice in one chunk of 2 (the last copy wins), and a copy of room 1 with no price (rejected)
+    write_feed(path, [feed[0], {**feed[0], "price": 2_500_000}] + feed[1:] + [{**feed[1], "price": ""}])
+
+    await import_feed(str(path), source, owner, chunk_size=2)
+    first = await imported(source)
+    assert sorted(first) == ["0", "1", "2", "3", "4"]
+    assert first["0"][1] == 2_500_000
+
+    # Same feed again: no new rows, and no row rewritten
+    await import_feed(str(path), source, owner, chunk_size=2)
+    assert await imported(source) == first
+
+    # Room 0 as stored, room 3 repriced: only room 3 is updated, in place
+    feed[0]["price"], feed[3]["price"] = 2_500_000, 9_000_000
+    write_feed(path, feed)
+    await import_feed(str(path), source, owner, chunk_size=2)
+    after = await imported(source)
+    assert after["3"][:2] == (first["3"][0], 9_000_000)
+    assert after["3"][2] != first["3"][2]
+    assert {k: v for k, v in after.items() if k != "3"} == {k: v for k, v in first.items() if k != "3"}
@@ -0,0 +1,104 @@
+import uuid
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+from core.config import settings
+from core.database import AsyncLocalSession, engine
+from services.listing_service import bulk_upsert_listings, recommendation_cache
+
+pytestmark = pytest.mark.anyio
+
+N = 40 # Listings added by the growth test, then 4N more
+PAGE = 20
+
+
+@contextmanager
+def count_statements():
+    """Counts the SQL statements the engine sends while the block runs."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
+
+@pytest.mark.parametrize("backend", ["sql", "numpy"])
+async def test_recommendation_queries_stay_flat_as_listings_grow(client, make_user, monkeypatch, backend):
+    monkeypatch.setattr(settings, "LISTING_SCORING_BACKEND", backend)
+    monkeypatch.setattr(settings, "LISTINGS_VERSION_POLL_SECONDS", 0) # Reads the version on every request
+
+    # Listings spread over 10 hosts, so a lazily loaded owner would cost one query each
+    hosts = [await make_user() for _ in range(10)]
+    source = f"test_{uuid.uuid4().hex[:12]}"
+    _, token = hosts[0]
+    headers = {"Authorization": f"Bearer {token}"}
+    assert (await client.get("/test/status", headers=headers)).status_code == 200 # Warms the user cache
+
+    async def add_listings(first: int, count: int):
+        async with AsyncLocalSession() as db:
+            await bulk_upsert_listings(db, [{
+                "source": source, "external_id": str(n), "owner_id": hosts[n % len(hosts)][0],
+                "title": f"Test listing {n}", "price": 3_000_000, "size": 30, "district": "District 1",
+                "images": [], "features": [], "description": None,
+            } for n in range(first, first + count)])
+            await db.commit()
+
+    async def statements_per_page() -> int:
+        recommendation_cache.clear()
+        with count_statements() as statements:
+            response = await client.get("/listings/recommendations", params={"limit": PAGE}, headers=headers)
+        assert response.status_code == 200
+        assert len(response.json()) == PAGE
+        return len(statements)
+
+    # N listings, then 5N, same page size
+    await add_listings(0, N)
+    small = await statements_per_page()
+    await add_listings(N, 4 * N)
+    large = await statements_per_page()
+
+    # Preferences, listings_version, ranking, the page's listings, their owners: whatever the table size
+    assert small == large, (small, large)
+    assert large <= 5, large
+
+
+async def test_listing_changes_from_another_process_invalidate_cached_pages(client, make_user, monkeypatch):
+    monkeypatch.setattr(settings, "LISTINGS_VERSION_POLL_SECONDS", 0)
+    (host, token), source = await make_user(), f"test_{uuid.uuid4().hex[:12]}"
+    headers = {"Authorization": f"Bearer {token}"}
+
+    def feed_row(n: int) -> dict:
+        return {"source": source, "external_id": str(n), "owner_id": host, "title": f"Test listing {n}",
+                "price": 3_000_000, "size": 30, "district": "District 1", "images": [], "features": [],
+                "description": None}
+
+    async def statements_per_page() -> int:
+        with count_statements() as statements:
+            assert (await client.get("/listings/recommendations", headers=headers)).status_code == 200
+        return len(statements)
+
+    assert (await client.get("/test/status", headers=headers)).status_code == 200 # Warms the user cache
+    recommendation_cache.clear()
+    miss = await statements_per_page()
+    hit = await statements_per_page()
+    assert hit < miss
+
+    # Uncommitted (then rolled back) writes leave the cached pages alone
+    async with AsyncLocalSession() as db:
+        await bulk_upsert_listings(db, [feed_row(0)])
+        assert await statements_per_page() == hit
+        await db.rollback()
+    assert await statements_per_page() == hit
+
+    # What import_listings.py does in its own process: the commit alone invalidates this worker's pages
+    async with AsyncLocalSession() as db:
+        await bulk_upsert_listings(db, [feed_row(1)])
+        await db.commit()
+    assert await statements_per_page() == miss
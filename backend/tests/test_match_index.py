@@ -0,0 +1,60 @@
+import numpy as np
+
+from core.config import settings
+
+from services.match_index import MatchIndex
+from services.matching import calculate_cosine_similarity, calculate_match_score
+from services.vector_logic import (
+    SLEEP_MAP, CLEANLINESS_MAP, NOISE_MAP, GUEST_MAP, BUDGET_MAP, PRIORITY_MAP, DISTRICT_MAP,
+    processing_submissions,
+)
+
+ANSWERS = {
+    "sleep_schedule": list(SLEEP_MAP),
+    "cleanliness": list(CLEANLINESS_MAP),
+    "noise_tolerance": list(NOISE_MAP),
+    "guest_frequency": list(GUEST_MAP),
+    "budget": list(BUDGET_MAP),
+    "priority": list(PRIORITY_MAP),
+    "district": list(DISTRICT_MAP),
+}
+
+
+def random_vectors(count: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return np.array([processing_submissions({question: choices[rng.integers(len(choices))]
+                                             for question, choices in ANSWERS.items()})
+                     for _ in range(count)], dtype=np.float64)
+
+
+def test_scores_match_the_reference_formula():
+    vectors = random_vectors(2000)
+    index = MatchIndex()
+    index.bulk_load(list(range(1, len(vectors) + 1)), vectors)
+
+    rows = np.arange(len(vectors))
+    for query in vectors[:50]:
+        expected = [calculate_match_score(calculate_cosine_similarity(vector, query)) for vector in vectors]
+        assert index.score_rows(rows, query).tolist() == expected
+
+
+def test_ivf_cursor_pages_only_end_when_the_pool_does(monkeypatch):
+    monkeypatch.setattr(settings, "MATCH_INDEX_BACKEND", "ivf")
+    monkeypatch.setattr(settings, "MATCH_INDEX_IVF_MIN_SIZE", 100)
+    monkeypatch.setattr(settings, "MATCH_INDEX_NLIST", 32)
+    vectors = random_vectors(3000, seed=1)
+    index = MatchIndex()
+    index.bulk_load(list(range(1, len(vectors) + 1)), vectors)
+    assert index._ivf is not None
+
+    # Page through my matches 50 at a time, as /matches/my-matches does
+    after = None
+    while True:
+        user_ids, scores = index.search(vectors[0], k=51, exclude_user_id=1, after=after, nprobe=1)
+        if len(user_ids) <= 50:
+            break
+        after = (int(scores[49]), int(user_ids[49]))
+
+    # ANN may skip users above a cursor, but the last page really is the last one
+    remaining, _ = index.search(vectors[0], k=None, exclude_user_id=1, after=after)
+    assert user_ids.tolist() == remaining.tolist()
@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+from sqlalchemy import select
+
+from core.database import AsyncLocalSession
+from models.user import User, UserVector
+from services.match_index import match_index
+from services.matching import get_user_vector
+from services.top_matches import finish_top_matches_updates
+
+pytestmark = pytest.mark.anyio
+
+PAGE = 30
+
+SUBMISSION = {
+    "sleep_schedule": "Average (11–12h)",
+    "cleanliness": "Somewhat clean",
+    "noise_tolerance": "Hard to adapt",
+    "guest_frequency": "Only when notified in advance",
+    "budget": "2-3mil VND",
+    "priority": "Security",
+    "district": "District 5",
+}
+
+
+@pytest.fixture
+async def submitted_user(client, make_user):
+    """A user who took the test, with their top-N list written; (user_id, headers, vector)."""
+    user_id, token = await make_user()
+    headers = {"Authorization": f"Bearer {token}"}
+    response = await client.post("/test/submit", headers=headers, json=SUBMISSION)
+    assert response.status_code == 200
+    await finish_top_matches_updates()
+    yield user_id, headers, response.json()["vector_generated"]
+    match_index.remove(user_id)
+
+
+async def walk_pages(client, headers, pages: int, **params) -> list:
+    """Follows X-Next-Cursor for up to `pages` pages; returns every profile in order."""
+    profiles, cursor = [], None
+    for _ in range(pages):
+        page_params = {**params, "limit": PAGE}
+        if cursor:
+            page_params["cursor"] = cursor
+        response = await client.get("/matches/my-matches", params=page_params, headers=headers)
+        assert response.status_code == 200
+        profiles += response.json()
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    return profiles
+
+
+async def test_match_pages_continue_past_the_stored_list(client, submitted_user):
+    user_id, headers, vector = submitted_user
+    async with AsyncLocalSession() as db:
+        assert (await get_user_vector(db, user_id)).top_match_floor is not None # First pages read the stored list
+
+    # 5 pages of 30 run past the stored 100 into the index, with no gap or repeat at the seam
+    profiles = await walk_pages(client, headers, pages=5)
+    expected_ids, expected_scores = match_index.search(vector, k=5 * PAGE, exclude_user_id=user_id, exact=True)
+    assert [p["user_id"] for p in profiles] == expected_ids.tolist()
+    assert [p["match_score"] for p in profiles] == expected_scores.tolist()
+
+
+async def test_listing_pages_concatenate(client, submitted_user):
+    _, headers, _ = submitted_user
+
+    async def page(skip: int, limit: int) -> list:
+        response = await client.get("/listings/recommendations", params={"skip": skip, "limit": limit},
+                                    headers=headers)
+        assert response.status_code == 200
+        return [listing["id"] for listing in response.json()]
+
+    whole = await page(0, 3 * PAGE)
+    assert len(whole) == 3 * PAGE
+    assert await page(0, PAGE) + await page(PAGE, PAGE) + await page(2 * PAGE, PAGE) == whole
+
+
+async def test_filtered_match_pages(client, submitted_user):
+    user_id, headers, vector = submitted_user
+    filters = {"district": ["District 5", "Thu Duc"], "budget": ["Over 3mil VND"], "gender": "Female"}
+
+    profiles = await walk_pages(client, headers, pages=20, **filters)
+
+    # Every candidate passing the filters, and only those, ranked as the unfiltered list would rank them
+    async with AsyncLocalSession() as db:
+        rows = await db.execute(
+            select(UserVector.user_id)
+            .join(User, User.id == UserVector.user_id)
+            .where(UserVector.is_completed == True, UserVector.user_id != user_id,
+                   UserVector.district.in_(filters["district"]), UserVector.budget.in_(filters["budget"]),
+                   User.gender == filters["gender"]))
+        passing = set(rows.scalars().all())
+    assert len(passing) > PAGE # Enough for the cursor to matter
+
+    ranked_ids, ranked_scores = match_index.search(vector, exclude_user_id=user_id)
+    keep = np.isin(ranked_ids, list(passing))
+    assert [p["user_id"] for p in profiles] == ranked_ids[keep].tolist()
+    assert [p["match_score"] for p in profiles] == ranked_scores[keep].tolist()
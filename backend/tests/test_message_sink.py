@@ -0,0 +1,32 @@
+import asyncio
+
+import pytest
+from sqlalchemy import func, select
+
+from core.database import AsyncLocalSession
+from models.message import Message
+from services.message_sink import MessageSink
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_a_bad_message_only_fails_itself(client, make_user):
+    (alice, _), (bob, _) = [await make_user() for _ in range(2)]
+    sink = MessageSink(batch_size=100, flush_interval=0.05, max_queue=100)
+    await sink.start()
+    try:
+        # Same batch: the middle message goes to a user that does not exist
+        futures = [await sink.submit(alice, bob, "one"),
+                   await sink.submit(alice, 2147483647, "lost"),
+                   await sink.submit(bob, alice, "two")]
+        results = await asyncio.gather(*futures, return_exceptions=True)
+    finally:
+        await sink.stop()
+
+    assert isinstance(results[1], Exception)
+    assert all(isinstance(result, tuple) for result in (results[0], results[2]))
+    async with AsyncLocalSession() as db:
+        saved = await db.scalar(select(func.count()).select_from(Message).where(
+            Message.sender_id.in_([alice, bob])))
+    assert saved == 2
+    assert sink.failed_messages == 1
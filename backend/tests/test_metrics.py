@@ -0,0 +1,62 @@
+import re
+
+import pytest
+
+from core.metrics import CHAT_COUNTERS, PROMETHEUS_CONTENT_TYPE
+
+pytestmark = pytest.mark.anyio
+
+SAMPLE = re.compile(r'^(?P<name>[a-z_]+)(?:\{(?P<labels>.*)\})? (?P<value>[0-9.e+-]+)$')
+HISTORY_ROUTE = 'method="GET",route="/chat/history/{partner_id}"'
+
+
+async def scrape(client) -> tuple:
+    """GET /metrics -> (samples as {(name, labels): value}, {name: TYPE}), checking every line parses."""
+    response = await client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == PROMETHEUS_CONTENT_TYPE
+
+    samples, types = {}, {}
+    for line in response.text.splitlines():
+        if line.startswith("# TYPE "):
+            _, _, name, kind = line.split(" ")
+            types[name] = kind
+        elif not line.startswith("# HELP "):
+            match = SAMPLE.match(line)
+            assert match, line
+            family = re.sub(r"_(bucket|sum|count)$", "", match["name"])
+            assert match["name"] in types or family in types, f"{line} has no # TYPE"
+            samples[(match["name"], match["labels"] or "")] = float(match["value"])
+    return samples, types
+
+
+async def test_metrics_exposition(client, make_user):
+    (partner, _), (_, token) = await make_user(), await make_user()
+    headers = {"Authorization": f"Bearer {token}"}
+    before, _ = await scrape(client)
+
+    for _ in range(3):
+        assert (await client.get(f"/chat/history/{partner}", headers=headers)).status_code == 200
+    samples, types = await scrape(client)
+
+    # 1. Routes are labelled by template, not by the partner id in the path
+    responses = ("fitnest_http_responses_total", HISTORY_ROUTE + ',status="200"')
+    assert samples[responses] - before.get(responses, 0) == 3
+    assert not any(str(partner) in labels for _, labels in samples)
+
+    # 2. Histogram buckets are cumulative and end at _count
+    for family in ("fitnest_http_request_duration_seconds", "fitnest_db_statements_per_request"):
+        assert types[family] == "histogram"
+        buckets = [value for (name, labels), value in samples.items()
+                   if name == f"{family}_bucket" and labels.startswith(HISTORY_ROUTE)]
+        assert buckets == sorted(buckets)
+        assert buckets[-1] == samples[(f"{family}_count", HISTORY_ROUTE)]
+    # History runs SQL: no request lands in the 0-statement bucket
+    assert samples[("fitnest_db_statements_per_request_bucket", HISTORY_ROUTE + ',le="0"')] == 0
+
+    # 3. Pool gauges and chat counters
+    assert types["fitnest_db_pool_in_use"] == "gauge"
+    assert samples[("fitnest_db_pool_checkout_wait_seconds_count", "")] > 0
+    for key in CHAT_COUNTERS:
+        assert types[f"fitnest_chat_{key}_total"] == "counter"
+    assert types["fitnest_chat_connections"] == "gauge"
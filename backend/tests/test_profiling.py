@@ -0,0 +1,53 @@
+import httpx
+import pytest
+
+from core.config import settings
+from core.profiling import ProfilingMiddleware
+
+pytestmark = pytest.mark.anyio
+
+
+class RouteError(Exception):
+    pass
+
+
+async def ok_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+async def failing_app(scope, receive, send):
+    raise RouteError("from the route")
+
+
+@pytest.fixture
+def profile_settings(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "PROFILE_ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(settings, "PROFILE_DIR", str(tmp_path / "profiles"))
+    return tmp_path
+
+
+def profiled_client(app) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=ProfilingMiddleware(app)),
+                             base_url="http://test", headers={"X-Profile": "secret"})
+
+
+async def test_profile_dir_is_capped(profile_settings, monkeypatch):
+    monkeypatch.setattr(settings, "PROFILE_MAX_FILES", 4)
+    async with profiled_client(ok_app) as client:
+        names = [(await client.get(f"/page/{i}")).headers["x-profile-file"] for i in range(5)]
+
+    kept = sorted(p.name for p in (profile_settings / "profiles").iterdir())
+    assert len(kept) == 4
+    assert names[-1] in kept
+
+
+async def test_failed_dump_keeps_the_request_exception(profile_settings):
+    (profile_settings / "profiles").write_text("not a directory") # makedirs fails in the dump
+
+    async with profiled_client(failing_app) as client:
+        with pytest.raises(RouteError):
+            await client.get("/boom")
+    # Nor does a successful request fail because of its dump
+    async with profiled_client(ok_app) as client:
+        assert (await client.get("/fine")).status_code == 200
@@ -0,0 +1,118 @@
+import asyncio
+
+import numpy as np
+import pytest
+from sqlalchemy import select, update
+from sqlalchemy.exc import DBAPIError
+
+from core.database import AsyncLocalSession
+from models.user import UserTopMatch, UserVector
+from services import top_matches
+from services.match_index import match_index
+
+pytestmark = pytest.mark.anyio
+
+
+async def add_vectors(*user_ids, floor=None):
+    async with AsyncLocalSession() as db:
+        for user_id in user_ids:
+            db.add(UserVector(user_id=user_id, is_completed=True, top_match_floor=floor))
+        await db.commit()
+
+
+async def floors(*user_ids) -> dict:
+    async with AsyncLocalSession() as db:
+        rows = await db.execute(select(UserVector.user_id, UserVector.top_match_floor)
+                                .where(UserVector.user_id.in_(user_ids)))
+        return dict(rows.all())
+
+
+def rank_each_other(monkeypatch, *user_ids):
+    """match_index.search returns every other given user, best first."""
+    def search(vector, exclude_user_id=None, **kwargs):
+        others = [u for u in user_ids if u != exclude_user_id]
+        return np.asarray(others, dtype=np.int64), np.arange(len(others) * 10, 0, -10, dtype=np.int64)
+    monkeypatch.setattr(match_index, "search", search)
+
+
+async def test_concurrent_updates_touching_the_same_lists(client, make_user, monkeypatch):
+    users = [(await make_user())[0] for _ in range(4)]
+    await add_vectors(*users, floor=-1)
+    rank_each_other(monkeypatch, *users)
+    monkeypatch.setattr(top_matches, "MAINTENANCE_ATTEMPTS", 1) # A deadlock must not be retried away
+
+    # Every update writes every other list: they must queue, not deadlock
+    await asyncio.gather(*[top_matches.maintain_top_matches(u, [0.0]) for u in users])
+
+    async with AsyncLocalSession() as db:
+        for user_id in users:
+            listed = (await db.execute(select(UserTopMatch.match_user_id)
+                                       .where(UserTopMatch.user_id == user_id))).scalars().all()
+            assert sorted(listed) == sorted(u for u in users if u != user_id)
+
+
+async def test_failed_update_marks_lists_stale(client, make_user, monkeypatch):
+    newcomer, reached, untouched = [(await make_user())[0] for _ in range(3)]
+    await add_vectors(newcomer, floor=-1)
+    await add_vectors(reached, floor=5)
+    await add_vectors(untouched, floor=100)
+    rank_each_other(monkeypatch, newcomer, reached, untouched) # untouched scores 10 < 100
+
+    attempts = []
+
+    async def failing_update(db, user_id, vector):
+        attempts.append(user_id)
+        raise RuntimeError("database went away")
+
+    monkeypatch.setattr(top_matches, "update_top_matches", failing_update)
+    await top_matches.maintain_top_matches(newcomer, [0.0])
+
+    assert len(attempts) == top_matches.MAINTENANCE_ATTEMPTS
+    assert await floors(newcomer, reached, untouched) == {newcomer: None, reached: None, untouched: 100}
+
+
+async def test_vector_missing_from_this_workers_index_is_scored(client, make_user):
+    newcomer, elsewhere = [(await make_user())[0] for _ in range(2)]
+    vector = np.random.default_rng(0).normal(size=7).tolist() # Unlike any quantized answer vector
+    await add_vectors(newcomer, floor=None)
+    await add_vectors(elsewhere, floor=-1)
+    async with AsyncLocalSession() as db:
+        await db.execute(update(UserVector).where(UserVector.user_id.in_([newcomer, elsewhere]))
+                         .values(vector_data_embeddings=vector))
+        await db.commit()
+        await match_index.ensure_loaded(db)
+    match_index.remove(elsewhere) # Submitted on another worker, not refreshed here yet
+
+    try:
+        async with AsyncLocalSession() as db:
+            await top_matches.update_top_matches(db, newcomer, vector)
+        async with AsyncLocalSession() as db:
+            best = (await db.execute(select(UserTopMatch.match_user_id, UserTopMatch.score)
+                                     .where(UserTopMatch.user_id == newcomer)
+                                     .order_by(UserTopMatch.score.desc()).limit(1))).one()
+            assert tuple(best) == (elsewhere, 100)
+            entered = await db.scalar(select(UserTopMatch.score).where(
+                UserTopMatch.user_id == elsewhere, UserTopMatch.match_user_id == newcomer))
+            assert entered == 100
+    finally:
+        match_index.remove(newcomer)
+        match_index.remove(elsewhere)
+
+
+async def test_only_lists_the_newcomer_enters_are_locked(client, make_user):
+    newcomer, reached, untouched = [(await make_user())[0] for _ in range(3)]
+    await add_vectors(reached, floor=5)
+    await add_vectors(untouched, floor=100)
+
+    async with AsyncLocalSession() as db, AsyncLocalSession() as other:
+        await top_matches.offer_to_lists(db, newcomer, np.asarray([reached, untouched]), np.asarray([50, 50]))
+
+        def row_lock(user_id):
+            return select(UserVector.user_id).where(UserVector.user_id == user_id).with_for_update(nowait=True)
+
+        assert await other.scalar(row_lock(untouched)) == untouched
+        await other.rollback()
+        with pytest.raises(DBAPIError):
+            await other.scalar(row_lock(reached))
+        await other.rollback()
+        await db.rollback()
@@ -2,7 +2,7 @@
 
 import { useState, useEffect, useRef } from 'react';
 import { useParams, useRouter } from 'next/navigation';
-import { getChatHistory, getWebSocketUrl, Message } from '@/services/chatService';
+import { getChatHistory, getWebSocketUrl, HISTORY_PAGE_SIZE, markConversationRead, Message } from '@/services/chatService';
 import { getUserPublicProfile } from '@/services/authService';
 import { MessageSquareDashed, Send, Phone, Video, MoreVertical } from 'lucide-react';
 import { Input } from '@/components/ui/input';
@@ -51,9 +51,12 @@ export default function ChatPage() {
   const [messages, setMessages] = useState<Message[]>([]);
   const [input, setInput] = useState('');
   const [status, setStatus] = useState('Connecting...');
+  const [hasOlder, setHasOlder] = useState(false);
+  const [loadingOlder, setLoadingOlder] = useState(false);
   
   const socketRef = useRef<WebSocket | null>(null);
   const messagesEndRef = useRef<HTMLDivElement>(null);
+  const scrollAreaRef = useRef<HTMLDivElement>(null);
 
   // 1. Load History & Connect Socket
   useEffect(() => {
@@ -62,7 +65,9 @@ export default function ChatPage() {
     // A. Fetch old history
     getChatHistory(partnerId).then(data => {
       setMessages(data);
+      setHasOlder(data.length === HISTORY_PAGE_SIZE); // A full page means there may be more
       scrollToBottom();
+      markConversationRead(partnerId).catch(err => console.error("Could not mark conversation read", err));
     });
 
     // B. Connect WebSocket
@@ -74,6 +79,8 @@ export default function ChatPage() {
     ws.onmessage = (event) => {
       // Receive incoming message from backend
       const data = JSON.parse(event.data);
+      // Save confirmations ({"ack": ...}) and errors are not chat lines
+      if (data.msg === undefined) return;
       // Backend sends: {"sender": 123, "msg": "Hello"}
       const newMsg: Message = {
         sender_id: data.sender,
@@ -98,6 +105,32 @@ export default function ChatPage() {
     messagesEndRef.current?.scrollIntoView({ behavior: "smooth" });
   };
 
+  // 2. Older history, one page at a time (scrolling to the top or the "load older" button)
+  const loadOlder = async () => {
+    const oldest = messages.find(msg => msg.id !== undefined);
+    if (!hasOlder || loadingOlder || !oldest) return;
+    setLoadingOlder(true);
+    try {
+      const area = scrollAreaRef.current;
+      const previousHeight = area?.scrollHeight ?? 0;
+      const older = await getChatHistory(partnerId, oldest.id);
+      setHasOlder(older.length === HISTORY_PAGE_SIZE);
+      setMessages(prev => [...older, ...prev]);
+      // Keep the message the user was looking at in place
+      requestAnimationFrame(() => {
+        if (area) area.scrollTop += area.scrollHeight - previousHeight;
+      });
+    } catch (err) {
+      console.error("Could not load older messages", err);
+    } finally {
+      setLoadingOlder(false);
+    }
+  };
+
+  const handleScroll = (e: React.UIEvent<HTMLDivElement>) => {
+    if (e.currentTarget.scrollTop === 0) loadOlder();
+  };
+
   const sendMessage = (e: React.FormEvent) => {
     e.preventDefault();
     if (!input.trim() || !socketRef.current || !myId) return;
@@ -147,7 +180,14 @@ export default function ChatPage() {
       </div>
 
       {/* Messages Area (Scrollable) */}
-      <div className="flex-1 overflow-y-auto p-4 space-y-4 bg-gray-50/50">
+      <div ref={scrollAreaRef} onScroll={handleScroll} className="flex-1 overflow-y-auto p-4 space-y-4 bg-gray-50/50">
+        {hasOlder && (
+          <div className="flex justify-center">
+            <Button variant="ghost" size="sm" className="text-xs text-gray-500" onClick={loadOlder} disabled={loadingOlder}>
+              {loadingOlder ? 'Loading...' : 'Load older messages'}
+            </Button>
+          </div>
+        )}
         {messages.length === 0 ? (
           <div className="h-full flex flex-col items-center justify-center text-gray-400 opacity-50">
             <MessageSquareDashed className="w-16 h-16 mb-2" />
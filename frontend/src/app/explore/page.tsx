@@ -12,8 +12,7 @@ import { EmptyState } from '@/components/EmptyState';
 
 // --- IMPORT DYNAMIC DATA SERVICES ---
 import { 
-  getExploreProfiles, 
-  getExploreListings, 
+  getExploreFeed, 
   ExploreProfile, 
   ExploreListing 
 } from '@/services/exploreService';
@@ -33,10 +32,8 @@ export default function ExplorePage() {
     const fetchData = async () => {
       setLoading(true);
       try {
-        const [profilesData, listingsData] = await Promise.all([
-          getExploreProfiles(),
-          getExploreListings()
-        ]);
+        // Matches and listings in one request
+        const { profiles: profilesData, listings: listingsData } = await getExploreFeed();
 
         // --- ADD THIS BLOCK START ---
         // 1. Get existing stars
@@ -16,6 +16,7 @@ import { SettingsRow } from '@/components/SettingsRow';
 
 // --- IMPORTS ---
 import { getMyProfile, ProfileData } from '@/services/onBoardingService';
+import { logoutUser } from '@/services/authService';
 import { getMyMatches } from '@/services/matchService';
 
 // --- TYPES ---
@@ -75,8 +76,8 @@ export default function ProfilePage() {
   }, [router]);
 
   // --- 2. Logout Logic ---
-  const handleLogout = () => {
-    localStorage.clear(); // Clears token, userId, username, etc.
+  const handleLogout = async () => {
+    await logoutUser(); // Revokes the token server-side, then clears token, userId, username, etc.
     router.replace('/login');
   };
 
@@ -6,13 +6,14 @@ import { Bell, SlidersHorizontal, Search, LogOut, Settings } from 'lucide-react'
 import { Button } from '@/components/ui/button';
 import { Input } from '@/components/ui/input';
 import * as DropdownMenu from '@radix-ui/react-dropdown-menu';
+import { logoutUser } from '@/services/authService';
 
 export default function MatchesHeader() {
   const router = useRouter();
 
   // --- LOGOUT LOGIC ---
-  const handleLogout = () => {
-    localStorage.removeItem('token');
+  const handleLogout = async () => {
+    await logoutUser();
     router.push('/');
   };
 
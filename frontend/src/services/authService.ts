@@ -32,6 +32,16 @@ export const loginUser = async (formData: FormData) => {
   return response.data;
 };
 
+// Revokes every token issued to this user (all devices), then forgets the local one
+export const logoutUser = async () => {
+  try {
+    await api.post('/auth/logout');
+  } catch (error) {
+    // Token already expired or revoked: nothing left to revoke
+  }
+  localStorage.clear(); // Clears token, userId, username, etc.
+};
+
 export const registerUser = async (data: any) => {
   // The backend expects specific JSON structure defined in CreateUserRequest
   const payload = {
@@ -18,8 +18,19 @@ export interface ConversationPreview {
   is_online?: boolean;
 }
 
-export const getChatHistory = async (partnerId: number) => {
-  const response = await api.get<Message[]>(`/chat/history/${partnerId}`);
+// Messages per history page (the backend returns the latest page by default)
+export const HISTORY_PAGE_SIZE = 50;
+
+// Pass the id of the oldest message already loaded as `before` to get the page before it
+export const getChatHistory = async (partnerId: number, before?: number) => {
+  const response = await api.get<Message[]>(`/chat/history/${partnerId}`, {
+    params: { limit: HISTORY_PAGE_SIZE, before }, // axios leaves out undefined params
+  });
+  return response.data;
+};
+
+export const markConversationRead = async (partnerId: number) => {
+  const response = await api.post(`/chat/read/${partnerId}`);
   return response.data;
 };
 
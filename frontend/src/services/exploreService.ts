@@ -32,29 +32,43 @@ export interface ExploreListing {
   description: string;
 }
 
+// 3. Explore Feed Type (Matches routers/explore.py)
+export interface ExploreFeed {
+  profiles: ExploreProfile[];
+  listings: ExploreListing[];
+}
+
+// Page sizes the explore page loads at once (same as the backend's defaults for the separate endpoints)
+export const EXPLORE_PAGE_SIZE = 20;
+
+// Transform Backend snake_case to Frontend camelCase/Interface format
+const toExploreProfile = (user: any): ExploreProfile => ({
+  id: user.user_id,
+  name: user.full_name || user.username,
+  age: user.age,
+  city: user.district,
+  university: user.university,
+  major: user.major,
+  image: user.avatar_url,
+  compatibility: user.match_score
+});
+
 // --- API Functions ---
 
+// Fetch Roommate Matches and Apartment Listings in one round trip
+export const getExploreFeed = async (): Promise<ExploreFeed> => {
+  const response = await api.get('/explore/feed', {
+    params: { match_limit: EXPLORE_PAGE_SIZE, listing_limit: EXPLORE_PAGE_SIZE }
+  });
+  return {
+    profiles: response.data.matches.map(toExploreProfile),
+    listings: response.data.listings
+  };
+};
+
 // Fetch Roommate Matches
 export const getExploreProfiles = async (): Promise<ExploreProfile[]> => {
   // Calls the endpoint we updated to use Vector Similarity
   const response = await api.get('/matches/my-matches');
-  
-  // Transform Backend snake_case to Frontend camelCase/Interface format
-  return response.data.map((user: any) => ({
-    id: user.user_id,
-    name: user.full_name || user.username,
-    age: user.age,
-    city: user.district,
-    university: user.university,
-    major: user.major,
-    image: user.avatar_url,
-    compatibility: user.match_score
-  }));
+  return response.data.map(toExploreProfile);
 };
-
-// Fetch Apartment Listings
-export const getExploreListings = async (): Promise<ExploreListing[]> => {
-  // Calls the endpoint we created with the Price/Location algorithm
-  const response = await api.get('/listings/recommendations');
-  return response.data;
-};
\ No newline at end of file